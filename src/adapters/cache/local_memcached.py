@@ -0,0 +1,98 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class LocalMemcachedServer:
+    """
+    Сервер memcached внутри процесса для разработки и проверки AsyncMemcachedClient без настоящего memcached.
+    Понимает подмножество текстового протокола, которое использует клиент: get, set, delete и mg с флагами t и v.
+    Значения хранятся в словаре, срок жизни проверяется при чтении.
+    commands — принятые команды по порядку; delay — задержка ответа для проверки таймаутов клиента.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.commands: list[bytes] = []
+        self._values: dict[bytes, tuple[bytes, Optional[float]]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set[asyncio.Task] = set()
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.address
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def _lookup(self, key: bytes) -> Optional[tuple[bytes, Optional[float]]]:
+        item = self._values.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return item
+
+    def _get(self, keys: list[bytes]) -> bytes:
+        response = b""
+        for key in keys:
+            if (item := self._lookup(key)) is not None:
+                response += b"VALUE %s 0 %d\r\n%s\r\n" % (key, len(item[0]), item[0])
+        return response + b"END\r\n"
+
+    def _meta_get(self, key: bytes, flags: list[bytes]) -> bytes:
+        if (item := self._lookup(key)) is None:
+            return b"EN\r\n"
+        value, expires_at = item
+        ttl = -1 if expires_at is None else max(0, round(expires_at - time.monotonic()))
+        header = b"VA %d" % len(value) + (b" t%d" % ttl if b"t" in flags else b"")
+        return header + b"\r\n" + (value if b"v" in flags else b"") + b"\r\n"
+
+    async def _set(self, reader: asyncio.StreamReader, key: bytes, expire: int, length: int) -> bytes:
+        value = (await reader.readexactly(length + 2))[:-2]
+        self._values[key] = (value, time.monotonic() + expire if expire > 0 else None)
+        return b"STORED\r\n"
+
+    async def _command(self, reader: asyncio.StreamReader, parts: list[bytes]) -> bytes:
+        command, args = parts[0], parts[1:]
+        self.commands.append(b" ".join(parts))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if command == b"get":
+            return self._get(args)
+        if command == b"mg":
+            return self._meta_get(args[0], args[1:])
+        if command == b"set":
+            return await self._set(reader, args[0], int(args[2]), int(args[3]))
+        if command == b"delete":
+            return b"DELETED\r\n" if self._values.pop(args[0], None) is not None else b"NOT_FOUND\r\n"
+        return b"ERROR\r\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while line := await reader.readline():
+                if parts := line.split():
+                    writer.write(await self._command(reader, parts))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # соединение закрывает close(); задача обработчика завершается без ошибки
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
@@ -0,0 +1,245 @@
+import asyncio
+import bisect
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from src.settings import settings
+
+
+class MemcachedError(Exception): ...
+
+
+class CircuitBreaker:
+    """
+    После threshold ошибок подряд сервер считается недоступным на retry_after секунд:
+    запросы к нему сразу завершаются промахом, а не ждут таймаута.
+    После паузы к серверу пропускается один пробный запрос, остальные ждут его результата промахом.
+    """
+
+    def __init__(self, threshold: int, retry_after: float):
+        self.threshold = threshold
+        self.retry_after = retry_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.retry_after:
+            return False
+        self.probing = True
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def abort(self) -> None:
+        # пробный запрос отменён не по вине сервера: следующий запрос станет новой пробой
+        self.probing = False
+
+
+class HashRing:
+    """
+    Консистентное хэширование ключей по серверам: при добавлении или потере сервера
+    переезжает только его доля ключей.
+    """
+
+    def __init__(self, nodes: list[str], replicas: int = 160):
+        self._ring: list[tuple[int, str]] = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def node(self, key: str) -> str:
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ServerPool:
+    """
+    Пул соединений к одному серверу memcached (текстовый протокол)
+    """
+
+    def __init__(self, address: str, size: int, timeout: float, breaker: CircuitBreaker):
+        host, _, port = address.partition(":")
+        self.host = host
+        self.port = int(port or 11211)
+        self.timeout = timeout
+        self.breaker = breaker
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self):
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._slots:
+            reader, writer = self._idle.get_nowait() if not self._idle.empty() else await self._connect()
+            try:
+                yield reader, writer
+            except BaseException:
+                # состояние потока неизвестно, соединение в пул не возвращаем
+                writer.close()
+                raise
+            self._idle.put_nowait((reader, writer))
+
+    @staticmethod
+    async def _roundtrip(reader, writer, request: bytes, read_response):
+        writer.write(request)
+        await writer.drain()
+        return await read_response(reader)
+
+    async def execute(self, request: bytes, read_response):
+        if not self.breaker.allow():
+            raise MemcachedError(f"{self.host}:{self.port} is unavailable")
+        try:
+            async with self.connection() as (reader, writer):
+                result = await asyncio.wait_for(self._roundtrip(reader, writer, request, read_response),
+                                                self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, MemcachedError) as e:
+            self.breaker.failure()
+            raise MemcachedError(str(e)) from e
+        except BaseException:
+            self.breaker.abort()
+            raise
+        self.breaker.success()
+        return result
+
+    async def close(self):
+        while not self._idle.empty():
+            _, writer = self._idle.get_nowait()
+            writer.close()
+
+
+async def _read_values(reader: asyncio.StreamReader) -> dict[str, bytes]:
+    values = {}
+    while True:
+        line = await reader.readline()
+        if line == b"END\r\n":
+            return values
+        if not line.startswith(b"VALUE "):
+            raise MemcachedError(line.decode(errors="replace").strip())
+        _, key, _flags, length = line.split()[:4]
+        data = await reader.readexactly(int(length) + 2)
+        values[key.decode()] = data[:-2]
+
+
+async def _read_meta(reader: asyncio.StreamReader) -> Optional[tuple[int, bytes]]:
+    # ответ meta get с флагами t и v: "VA <длина> t<ttl>" и данные либо "EN" (нет ключа)
+    line = await reader.readline()
+    if line == b"EN\r\n":
+        return None
+    if not line.startswith(b"VA "):
+        raise MemcachedError(line.decode(errors="replace").strip())
+    parts = line.split()
+    ttl = next((int(flag[1:]) for flag in parts[2:] if flag.startswith(b"t")), -1)
+    data = await reader.readexactly(int(parts[1]) + 2)
+    return ttl, data[:-2]
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    return (await reader.readline()).rstrip(b"\r\n")
+
+
+class AsyncMemcachedClient:
+    """
+    Асинхронный клиент memcached: пул соединений на сервер, несколько серверов
+    с консистентным хэшированием, multi-get одной командой на сервер, таймауты
+    и circuit breaker. Недоступный memcached ведёт себя как пустой кэш.
+    """
+
+    def __init__(self, servers: list[str], pool_size: int = 10, timeout: float = 0.5,
+                 failure_threshold: int = 5, retry_after: float = 10):
+        self._ring = HashRing(servers)
+        self._pools = {
+            server: ServerPool(server, pool_size, timeout, CircuitBreaker(failure_threshold, retry_after))
+            for server in servers
+        }
+
+    @staticmethod
+    def _key(key: str) -> str:
+        # ключ memcached: до 250 байт, без пробелов и управляющих символов
+        if len(key) > 250 or any(c.isspace() or ord(c) < 33 for c in key):
+            return hashlib.sha1(key.encode()).hexdigest()
+        return key
+
+    def _pool(self, key: str) -> ServerPool:
+        return self._pools[self._ring.node(key)]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        by_server: dict[str, dict[str, str]] = {}
+        for key in keys:
+            safe = self._key(key)
+            by_server.setdefault(self._ring.node(safe), {})[safe] = key
+
+        async def fetch(server: str, names: dict[str, str]):
+            request = b"get " + " ".join(names).encode() + b"\r\n"
+            try:
+                values = await self._pools[server].execute(request, _read_values)
+            except MemcachedError:
+                return {}
+            return {names[safe]: value for safe, value in values.items() if safe in names}
+
+        result = {}
+        for values in await asyncio.gather(*(fetch(server, names) for server, names in by_server.items())):
+            result.update(values)
+        return result
+
+    async def get_with_ttl(self, key: str) -> tuple[int, Optional[bytes]]:
+        """
+        Значение и оставшийся срок жизни в секундах (-1 — бессрочно или неизвестно)
+        через meta get (memcached 1.6+)
+        """
+        safe = self._key(key)
+        try:
+            result = await self._pool(safe).execute(f"mg {safe} t v\r\n".encode(), _read_meta)
+        except MemcachedError:
+            return -1, None
+        return result if result is not None else (-1, None)
+
+    async def set(self, key: str, value: bytes, expire: int = 0) -> bool:
+        key = self._key(key)
+        request = f"set {key} 0 {expire} {len(value)}\r\n".encode() + value + b"\r\n"
+        try:
+            return await self._pool(key).execute(request, _read_line) == b"STORED"
+        except MemcachedError:
+            return False
+
+    async def delete(self, key: str) -> bool:
+        key = self._key(key)
+        try:
+            return await self._pool(key).execute(f"delete {key}\r\n".encode(), _read_line) == b"DELETED"
+        except MemcachedError:
+            return False
+
+    async def close(self) -> None:
+        for pool in self._pools.values():
+            await pool.close()
+
+
+memcached_client = AsyncMemcachedClient(
+    settings.memcache_servers,
+    pool_size=settings.memcache_pool_size,
+    timeout=settings.memcache_timeout,
+    failure_threshold=settings.memcache_failure_threshold,
+    retry_after=settings.memcache_retry_after,
+)
@@ -0,0 +1,25 @@
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+
+from src.adapters.database.session import engine
+
+
+async def run_exclusively(key: int, job: Callable[[], Awaitable[None]]) -> bool:
+    """
+    Выполняет job, только если удалось взять сессионную advisory-блокировку key: фоновые задачи
+    запускаются в каждом воркере uvicorn, но проход выполняет один из них, остальные сразу выходят.
+    Блокировка держится на отдельном соединении без открытой транзакции и снимается
+    сама, если соединение оборвётся. Возвращает False, если проход уже идёт в другом процессе.
+    """
+    async with engine.connect() as connection:
+        locked = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar()
+        await connection.commit()
+        if not locked:
+            return False
+        try:
+            await job()
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+            await connection.commit()
+    return True
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from sqlalchemy import String, Integer, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.adapters.database.models.base import BaseWithTelemetryTimestamps
+
+
+class Blob(BaseWithTelemetryTimestamps):
+    """
+    Уникальное содержимое файла, адресуемое по sha256.
+    Строки files ссылаются на blob, ref_count — число таких ссылок.
+    """
+    __tablename__ = "blobs"
+
+    digest: Mapped[str] = mapped_column(String(64), unique=True)
+    path: Mapped[str] = mapped_column(String)
+    size: Mapped[int] = mapped_column(BigInteger)
+    ref_count: Mapped[int] = mapped_column(Integer, default=1)
+    # сжатые копии рядом с содержимым (<path>.br, .zst, .gz) через запятую, в порядке предпочтения
+    encodings: Mapped[Optional[str]] = mapped_column(String)
+    # CRC32 содержимого для ZIP-экспорта без повторного чтения файла
+    crc32: Mapped[Optional[int]] = mapped_column(BigInteger)
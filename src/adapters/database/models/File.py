@@ -1,4 +1,6 @@
-from sqlalchemy import String, Integer, ForeignKey, Boolean
+from typing import Optional
+
+from sqlalchemy import String, Integer, ForeignKey, Boolean, BigInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.adapters.database.models.base import Base, BaseWithTelemetryTimestamps
@@ -6,6 +8,10 @@ from src.adapters.database.models.base import Base, BaseWithTelemetryTimestamps
 
 class File(BaseWithTelemetryTimestamps):
     __tablename__ = "files"
+    __table_args__ = (
+        # список файлов пользователя: WHERE user_id, type, is_active ORDER BY create_date DESC, id DESC
+        Index("ix_files_user_listing", "user_id", "type", "is_active", "create_date", "id"),
+    )
 
     name: Mapped[str] = mapped_column(String)
     user_id: Mapped[int] = mapped_column(Integer, index=True)
@@ -13,3 +19,7 @@ class File(BaseWithTelemetryTimestamps):
     path: Mapped[str] = mapped_column(String)
     type: Mapped[str] = mapped_column(String)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    blob_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("blobs.id"), index=True)
+    size: Mapped[Optional[int]] = mapped_column(BigInteger)
+    # CRC32 старого файла без blob для ZIP-экспорта; у файлов с blob берётся из blobs.crc32
+    crc32: Mapped[Optional[int]] = mapped_column(BigInteger)
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from sqlalchemy import String, Integer, ForeignKey, Boolean, BigInteger, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.adapters.database.models.base import BaseWithTelemetryTimestamps
+
+
+class UploadSession(BaseWithTelemetryTimestamps):
+    """
+    Сессия возобновляемой загрузки
+    """
+    __tablename__ = "upload_sessions"
+
+    token: Mapped[str] = mapped_column(String, unique=True, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, index=True)
+    name: Mapped[str] = mapped_column(String)
+    type: Mapped[str] = mapped_column(String)
+    size: Mapped[int] = mapped_column(BigInteger)
+    chunk_size: Mapped[int] = mapped_column(Integer)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+
+
+class UploadChunk(BaseWithTelemetryTimestamps):
+    """
+    Принятая часть возобновляемой загрузки
+    """
+    __tablename__ = "upload_chunks"
+    __table_args__ = (UniqueConstraint("session_id", "index"),)
+
+    session_id: Mapped[int] = mapped_column(Integer, ForeignKey("upload_sessions.id"), index=True)
+    index: Mapped[int] = mapped_column(Integer)
+    offset: Mapped[int] = mapped_column(BigInteger)
+    size: Mapped[int] = mapped_column(Integer)
+    checksum: Mapped[str] = mapped_column(String)
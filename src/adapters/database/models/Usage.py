@@ -0,0 +1,20 @@
+from sqlalchemy import String, Integer, BigInteger, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.adapters.database.models.base import BaseWithTelemetryTimestamps
+
+
+class Usage(BaseWithTelemetryTimestamps):
+    """
+    Объём активных файлов пользователя по типу; строка с type = TOTAL_TYPE — сумма по всем типам.
+    Счётчики меняются при загрузке и отключении файлов, периодически пересчитываются по files.
+    """
+    __tablename__ = "usage"
+    __table_args__ = (UniqueConstraint("user_id", "type"),)
+
+    TOTAL_TYPE = "*"
+
+    user_id: Mapped[int] = mapped_column(Integer)
+    type: Mapped[str] = mapped_column(String)
+    bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+    files: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,7 +1,305 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, delete, update, tuple_, func, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import NoResultFound
+
+from src.adapters.database.models.Blob import Blob
 from src.adapters.database.models.File import File
+from src.adapters.database.models.UploadSession import UploadSession, UploadChunk
+from src.adapters.database.models.Usage import Usage
+from src.utils.exceptions import ResultNotFound
 from src.utils.repository import SQLAlchemyRepository
 
 
 class FileRepository(SQLAlchemyRepository):
     model = File
 
+    async def find_latest(self, **filter_by):
+        stmt = (
+            select(self.model)
+            .filter_by(**filter_by)
+            .order_by(self.model.id.desc())
+            .limit(1)
+        )
+        res = await self.session.execute(stmt)
+        try:
+            return res.scalar_one()
+        except NoResultFound:
+            raise ResultNotFound
+
+
+    async def find_latest_with_digest(self, **filter_by):
+        """
+        Последний файл по фильтру вместе с sha256 и сжатыми копиями его blob (None для файлов без blob)
+        """
+        stmt = (
+            select(self.model, Blob.digest, Blob.encodings)
+            .filter_by(**filter_by)
+            .outerjoin(Blob, Blob.id == self.model.blob_id)
+            .order_by(self.model.id.desc())
+            .limit(1)
+        )
+        res = await self.session.execute(stmt)
+        try:
+            return res.one()
+        except NoResultFound:
+            raise ResultNotFound
+
+    async def find_page(self, user_id: int, type: str, after: Optional[tuple[datetime, int]], limit: int):
+        """
+        Страница активных файлов пользователя по ключу (create_date, id) в порядке убывания.
+        Выбираются только нужные колонки, без ORM-объектов.
+        """
+        stmt = (
+            select(self.model.id, self.model.name, self.model.hash, self.model.create_date, Blob.digest)
+            .filter_by(user_id=user_id, type=type, is_active=True)
+            .outerjoin(Blob, Blob.id == self.model.blob_id)
+            .order_by(self.model.create_date.desc(), self.model.id.desc())
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.filter(tuple_(self.model.create_date, self.model.id) < after)
+        res = await self.session.execute(stmt)
+        return res.fetchall()
+
+    async def find_export_page(self, user_id: int, type: str, after_id: int, limit: int):
+        """
+        Активные файлы пользователя по возрастанию id с размером и CRC32 из blob — для ZIP-экспорта
+        """
+        stmt = (
+            select(self.model.id, self.model.name, self.model.hash, self.model.path, self.model.blob_id,
+                   self.model.create_date, func.coalesce(Blob.size, self.model.size).label("size"),
+                   func.coalesce(Blob.crc32, self.model.crc32).label("crc32"))
+            .filter_by(user_id=user_id, type=type, is_active=True)
+            .outerjoin(Blob, Blob.id == self.model.blob_id)
+            .filter(self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.fetchall()
+
+    async def find_without_blob(self, after_id: int, limit: int):
+        stmt = (
+            select(self.model)
+            .filter(self.model.blob_id.is_(None), self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().fetchall()
+
+    async def find_legacy_without_crc32(self, after_id: int, limit: int):
+        stmt = (
+            select(self.model)
+            .filter(self.model.blob_id.is_(None), self.model.is_active.is_(True), self.model.crc32.is_(None),
+                    self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().fetchall()
+
+    async def detach_blobs(self, blob_ids: list[int]) -> None:
+        """
+        Отвязывает неактивные файлы от blob перед удалением blob
+        """
+        stmt = update(self.model).filter(self.model.blob_id.in_(blob_ids)).values(blob_id=None)
+        await self.session.execute(stmt)
+
+
+class BlobRepository(SQLAlchemyRepository):
+    model = Blob
+
+    async def acquire(self, digest: str, path: str, size: int, crc32: Optional[int] = None):
+        """
+        Добавляет blob или увеличивает счётчик ссылок существующего одним запросом.
+        Строка блокируется до конца транзакции, поэтому параллельная загрузка того же
+        содержимого дождётся, пока первая не запишет файл и не закоммитит.
+        """
+        stmt = insert(self.model).values(digest=digest, path=path, size=size, ref_count=1, crc32=crc32)
+        stmt = (
+            stmt.on_conflict_do_update(
+                index_elements=[self.model.digest],
+                set_={
+                    "ref_count": self.model.ref_count + 1,
+                    "modify_date": datetime.now(),
+                    # у blob, созданных до появления crc32, он заполняется при повторной загрузке
+                    "crc32": func.coalesce(self.model.crc32, stmt.excluded.crc32),
+                },
+            )
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalar_one()
+
+    async def release(self, id: int) -> None:
+        stmt = (
+            update(self.model)
+            .filter_by(id=id)
+            .values(ref_count=self.model.ref_count - 1, modify_date=datetime.now())
+        )
+        await self.session.execute(stmt)
+
+
+    async def find_after(self, after_id: int, limit: int):
+        stmt = select(self.model).filter(self.model.id > after_id).order_by(self.model.id).limit(limit)
+        res = await self.session.execute(stmt)
+        return res.scalars().fetchall()
+
+    async def find_without_crc32(self, after_id: int, limit: int):
+        stmt = (
+            select(self.model)
+            .filter(self.model.crc32.is_(None), self.model.ref_count > 0, self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().fetchall()
+
+    async def find_existing_paths(self, paths: list[str]) -> set[str]:
+        res = await self.session.execute(select(self.model.path).filter(self.model.path.in_(paths)))
+        return set(res.scalars().fetchall())
+
+    async def lock_unreferenced(self, before: datetime, limit: int):
+        """
+        blob без ссылок, не менявшиеся с before. Строки блокируются до конца транзакции;
+        заблокированные загрузкой пропускаются, а acquire во время сборки ждёт её commit.
+        """
+        stmt = (
+            select(self.model)
+            .filter(self.model.ref_count <= 0, self.model.modify_date < before)
+            .order_by(self.model.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().fetchall()
+
+
+class UploadSessionRepository(SQLAlchemyRepository):
+    model = UploadSession
+
+    async def lock_active(self, token: str, read: bool = False):
+        """
+        Активная сессия с блокировкой строки до конца транзакции: read=True (FOR SHARE) — для записи частей,
+        которые могут идти параллельно, иначе FOR UPDATE — для завершения, исключающего всё остальное
+        """
+        stmt = (
+            select(self.model)
+            .filter_by(token=token, is_active=True)
+            .with_for_update(read=read)
+            .execution_options(populate_existing=True)
+        )
+        res = await self.session.execute(stmt)
+        try:
+            return res.scalar_one()
+        except NoResultFound:
+            raise ResultNotFound
+
+    async def find_expired(self, now: datetime, limit: int):
+        stmt = (
+            select(self.model)
+            .filter(self.model.is_active.is_(True), self.model.expires_at < now)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().fetchall()
+
+
+class UploadChunkRepository(SQLAlchemyRepository):
+    model = UploadChunk
+
+    async def upsert(self, data: dict):
+        stmt = insert(self.model).values(**data)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.model.session_id, self.model.index],
+            set_={key: stmt.excluded[key] for key in ("offset", "size", "checksum")},
+        )
+        await self.session.execute(stmt)
+
+    async def delete_for_sessions(self, session_ids: list[int]) -> None:
+        await self.session.execute(delete(self.model).filter(self.model.session_id.in_(session_ids)))
+
+
+class UsageRepository(SQLAlchemyRepository):
+    model = Usage
+
+    async def find_total(self, user_id: int) -> int:
+        stmt = select(self.model.bytes).filter_by(user_id=user_id, type=Usage.TOTAL_TYPE)
+        return (await self.session.execute(stmt)).scalar_one_or_none() or 0
+
+    def _add(self, user_id: int, type: str, size: int, files: int, where=None):
+        stmt = insert(self.model).values(user_id=user_id, type=type, bytes=max(size, 0), files=max(files, 0))
+        return stmt.on_conflict_do_update(
+            index_elements=[self.model.user_id, self.model.type],
+            # счётчик не уходит в минус из-за файлов, загруженных до появления учёта
+            set_={
+                "bytes": func.greatest(self.model.bytes + size, 0),
+                "files": func.greatest(self.model.files + files, 0),
+                "modify_date": datetime.now(),
+            },
+            where=where,
+        )
+
+    async def add(self, user_id: int, type: str, size: int, files: int, limit: Optional[int] = None) -> bool:
+        """
+        Прибавляет size байт и files файлов к счётчикам типа и пользователя без чтения files.
+        С limit общий счётчик меняется, только если после этого не превысит limit (иначе False).
+        Строка общего счётчика остаётся заблокированной до конца транзакции, поэтому параллельные
+        загрузки одного пользователя не превысят квоту вместе.
+        """
+        if limit and size > limit:
+            return False
+        where = self.model.bytes + size <= limit if limit and size > 0 else None
+        res = await self.session.execute(self._add(user_id, Usage.TOTAL_TYPE, size, files, where)
+                                         .returning(self.model.id))
+        if res.scalar_one_or_none() is None:
+            return False
+        await self.session.execute(self._add(user_id, type, size, files))
+        return True
+
+    async def find_user_ids_after(self, after_id: int, limit: int) -> list[int]:
+        # пользователи с файлами и пользователи со счётчиками, у которых файлов уже нет
+        stmt = union(
+            select(File.user_id).filter(File.user_id > after_id),
+            select(self.model.user_id).filter(self.model.user_id > after_id),
+        ).order_by("user_id").limit(limit)
+        return list((await self.session.execute(stmt)).scalars().all())
+
+    async def recompute(self, user_ids: list[int]) -> None:
+        """
+        Пересчитывает счётчики пользователей по активным файлам. Общие счётчики блокируются
+        до подсчёта: загрузка, уже прибавившая размер, успеет закоммитить, новая дождётся пересчёта.
+        """
+        await self.session.execute(
+            select(self.model.id)
+            .filter(self.model.user_id.in_(user_ids), self.model.type == Usage.TOTAL_TYPE)
+            .order_by(self.model.user_id)
+            .with_for_update()
+        )
+        stmt = (
+            select(File.user_id, File.type, func.sum(func.coalesce(File.size, Blob.size, 0)), func.count())
+            .outerjoin(Blob, Blob.id == File.blob_id)
+            .filter(File.user_id.in_(user_ids), File.is_active.is_(True))
+            .group_by(File.user_id, File.type)
+        )
+        rows, totals = [], {user_id: [0, 0] for user_id in user_ids}
+        for user_id, type, size, files in (await self.session.execute(stmt)).all():
+            rows.append({"user_id": user_id, "type": type, "bytes": size, "files": files})
+            totals[user_id][0] += size
+            totals[user_id][1] += files
+        rows += [{"user_id": user_id, "type": Usage.TOTAL_TYPE, "bytes": size, "files": files}
+                 for user_id, (size, files) in totals.items()]
+        # типы, файлов которых больше нет, обнуляются
+        await self.session.execute(
+            update(self.model).filter(self.model.user_id.in_(user_ids)).values(bytes=0, files=0)
+        )
+        stmt = insert(self.model).values(rows)
+        await self.session.execute(stmt.on_conflict_do_update(
+            index_elements=[self.model.user_id, self.model.type],
+            set_={"bytes": stmt.excluded["bytes"], "files": stmt.excluded["files"], "modify_date": datetime.now()},
+        ))
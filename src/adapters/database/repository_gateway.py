@@ -1,9 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.adapters.database.repositories import FileRepository
+from src.adapters.database.repositories import FileRepository, UploadSessionRepository, UploadChunkRepository, \
+    BlobRepository, UsageRepository
 from src.utils.repositories_gateway import RepositoriesGatewayProtocol
 
 
 class RepositoriesGateway(RepositoriesGatewayProtocol):
     def __init__(self, session: AsyncSession):
-        self.file = FileRepository(session)
\ No newline at end of file
+        self.file = FileRepository(session)
+        self.blob = BlobRepository(session)
+        self.upload_session = UploadSessionRepository(session)
+        self.upload_chunk = UploadChunkRepository(session)
+        self.usage = UsageRepository(session)
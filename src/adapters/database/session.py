@@ -2,6 +2,12 @@ from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from src.settings import settings
 
-engine = create_async_engine(settings.postgres_url)
+engine = create_async_engine(settings.postgres_url, **settings.engine_options)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# без реплики чтение идёт в основную базу
+replica_engine = (
+    create_async_engine(settings.database_replica_url, **settings.engine_options)
+    if settings.database_replica_url else engine
+)
+async_replica_session_maker = async_sessionmaker(replica_engine, expire_on_commit=False)
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+from src.settings import settings
+from src.utils.streaming import publish, discard, digest_file
+
+
+class StorageBackend(Protocol):
+    """
+    Хранилище содержимого blob по ключу (blobs/ab/cd/<digest>).
+    Загрузки сначала пишутся в локальный staging, put() забирает готовый файл в хранилище.
+    remote — передача в хранилище долгая, и новое содержимое отправляется до транзакции БД.
+    """
+
+    remote: bool
+
+    async def put(self, key: str, source: str, keep: bool = False) -> None:
+        """
+        Переносит локальный файл source в хранилище под ключом key; source после этого
+        не существует, если не задан keep
+        """
+        ...
+
+    async def local_path(self, key: str) -> Optional[str]:
+        """
+        Путь к локальной копии объекта для отдачи (None, если объекта нет)
+        """
+        ...
+
+    async def exists(self, key: str) -> bool:
+        ...
+
+    async def digest(self, key: str, chunk_size: int) -> Optional[tuple[str, int, int]]:
+        """
+        sha256, размер и CRC32 объекта (None, если объекта нет). Содержимое читается потоком
+        из хранилища и не попадает в кэш локальных копий.
+        """
+        ...
+
+    async def delete_many(self, keys: list[str]) -> None:
+        ...
+
+    def iter_batches(self, prefix: str, size: int) -> AsyncIterator[list[tuple[str, float]]]:
+        """
+        Ключи под prefix пачками по size вместе с временем изменения
+        """
+        ...
+
+    def stats(self) -> dict:
+        ...
+
+
+def _walk(root: str, prefix: str):
+    for dirpath, _, names in os.walk(os.path.join(root, prefix)):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            try:
+                yield os.path.relpath(path, root), os.stat(path).st_mtime
+            except FileNotFoundError:
+                pass
+
+
+def _next_batch(entries, size: int) -> list[tuple[str, float]]:
+    return [entry for _, entry in zip(range(size), entries)]
+
+
+def _copy_and_publish(source: str, destination: str) -> None:
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=".copy-")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        publish(tmp_path, destination)
+    except BaseException:
+        discard(tmp_path)
+        raise
+
+
+def _discard_many(paths: list[str]) -> None:
+    for path in paths:
+        discard(path)
+
+
+class LocalStorage:
+    """
+    Файлы на локальном диске под корнем хранилища
+    """
+
+    remote = False
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put(self, key: str, source: str, keep: bool = False) -> None:
+        await run_in_threadpool(_copy_and_publish if keep else publish, source, self.path(key))
+
+    async def local_path(self, key: str) -> Optional[str]:
+        # наличие файла проверяет os.stat при чтении метаданных, здесь лишнего обращения к диску нет
+        return self.path(key)
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool(os.path.exists, self.path(key))
+
+    async def digest(self, key: str, chunk_size: int) -> Optional[tuple[str, int, int]]:
+        try:
+            return await digest_file(self.path(key), chunk_size)
+        except FileNotFoundError:
+            return None
+
+    async def delete_many(self, keys: list[str]) -> None:
+        await run_in_threadpool(_discard_many, [self.path(key) for key in keys])
+
+    async def iter_batches(self, prefix: str, size: int) -> AsyncIterator[list[tuple[str, float]]]:
+        entries = _walk(self.root, prefix)
+        while batch := await run_in_threadpool(_next_batch, entries, size):
+            yield batch
+
+    def stats(self) -> dict:
+        return {"backend": "local"}
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.file_storage)
+    if settings.storage_backend == "s3":
+        from src.adapters.storage.s3 import S3Storage
+        return S3Storage(settings.s3_bucket, settings.s3_options)
+    raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
@@ -0,0 +1,48 @@
+import os
+
+from src.settings import settings
+from src.utils.compression import SUFFIXES
+from src.utils.layout import sharded_key
+
+
+class BlobStore:
+    """
+    Раскладка содержимого, адресуемого по sha256: ключ blobs/ab/cd/<digest> в StorageBackend.
+    Новое содержимое сначала пишется в локальный staging/ (для локального хранилища — та же
+    файловая система, поэтому перенос атомарен).
+    """
+
+    PREFIX = "blobs"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.staging = os.path.join(root, "staging")
+
+    @classmethod
+    def key(cls, digest: str) -> str:
+        return sharded_key(cls.PREFIX, digest)
+
+    @staticmethod
+    def encoded_key(key: str, encoding: str) -> str:
+        return key + SUFFIXES[encoding]
+
+    @staticmethod
+    def base_key(key: str) -> str:
+        """
+        Ключ blob, к которому относится объект: для сжатой копии — без суффикса кодировки
+        """
+        for suffix in SUFFIXES.values():
+            if key.endswith(suffix):
+                return key[:-len(suffix)]
+        return key
+
+    @classmethod
+    def keys(cls, blob) -> list[str]:
+        """
+        Все объекты blob в хранилище: содержимое и его сжатые копии
+        """
+        encodings = blob.encodings.split(",") if blob.encodings else []
+        return [blob.path] + [cls.encoded_key(blob.path, encoding) for encoding in encodings]
+
+
+blob_store = BlobStore(settings.file_storage)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import tempfile
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from src.utils.streaming import discard
+
+
+# вытесненный файл удаляется не сразу: путь, уже отданный FileResponse или nginx, должен успеть открыться
+EVICTION_GRACE = 60
+# каталог общий для воркеров: чужие копии и удаления учитываются при пересканировании
+RESCAN_INTERVAL = 60
+# временный файл скачивания, который так долго не менялся, брошен упавшим воркером
+STALE_FETCH_AGE = 60 * 60
+
+
+def _scan(directory: str) -> list[tuple[str, int, float]]:
+    entries = []
+    now = time.time()
+    for dirpath, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.startswith(".fetch-"):
+                # в этот файл может прямо сейчас скачивать другой воркер
+                if stat_result.st_mtime < now - STALE_FETCH_AGE:
+                    discard(path)
+                continue
+            if _is_retired(stat_result):
+                continue
+            entries.append((os.path.relpath(path, directory), stat_result.st_size, stat_result.st_atime))
+    # восстанавливаем порядок LRU по времени последнего доступа
+    entries.sort(key=lambda entry: entry[2])
+    return entries
+
+
+def _is_retired(stat_result: os.stat_result) -> bool:
+    # atime = 0 — метка вытесненной копии; mtime не трогается, он отдаётся как Last-Modified
+    return stat_result.st_atime == 0
+
+
+def _retire(path: str) -> None:
+    try:
+        os.utime(path, (0, os.stat(path).st_mtime))
+    except FileNotFoundError:
+        pass
+
+
+def _discard_retired(path: str) -> None:
+    # копию могли скачать заново (новый файл без метки) или прочитать за время ожидания (atime обновлён)
+    try:
+        if _is_retired(os.stat(path)):
+            discard(path)
+    except FileNotFoundError:
+        pass
+
+
+def _live(path: str) -> bool:
+    try:
+        return not _is_retired(os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+class DiskCache:
+    """
+    Локальные копии объектов удалённого хранилища: LRU с ограничением по суммарному размеру.
+    Объекты неизменяемы (ключ — sha256 содержимого), поэтому копия не устаревает,
+    а вытесняется только по размеру. Параллельные промахи по одному ключу скачивают его один раз.
+
+    Каталог может быть общим для нескольких воркеров: раз в RESCAN_INTERVAL секунд индекс сверяется
+    с диском, и max_bytes ограничивает все копии в каталоге, а не только скачанные этим воркером.
+    Вытесненные файлы удаляются через EVICTION_GRACE секунд.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        self._retired: deque[tuple[float, str]] = deque()
+        self._retired_at: dict[str, float] = {}
+        self._scanned_at: Optional[float] = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    async def _sync(self):
+        """
+        Сверка индекса с диском: копии с прошлого запуска и других воркеров учитываются в размере,
+        удалённые другими воркерами — забываются
+        """
+        if self._scanned_at is not None and time.monotonic() - self._scanned_at < RESCAN_INTERVAL:
+            return
+        self._scanned_at = time.monotonic()
+        scanned = await run_in_threadpool(_scan, self.directory)
+        on_disk = {key for key, _, _ in scanned}
+        for key in [key for key in self._entries if key not in on_disk and key not in self._loading]:
+            del self._entries[key]
+        # чужие копии ставятся перед своими, самые давние по atime — первыми
+        for key, size, _ in reversed(scanned):
+            if key not in self._entries:
+                self._entries[key] = size
+                self._entries.move_to_end(key, last=False)
+            else:
+                self._entries[key] = size
+        self.size = sum(self._entries.values())
+
+    async def _purge(self):
+        now = time.monotonic()
+        while self._retired and self._retired[0][0] <= now:
+            deadline, key = self._retired.popleft()
+            if self._retired_at.get(key) != deadline:
+                continue
+            del self._retired_at[key]
+            # за время ожидания копию могли скачать заново
+            if key not in self._entries and key not in self._loading:
+                await run_in_threadpool(_discard_retired, self.path(key))
+
+    async def _evict(self):
+        await self._sync()
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            deadline = time.monotonic() + EVICTION_GRACE
+            self._retired.append((deadline, key))
+            self._retired_at[key] = deadline
+            await run_in_threadpool(_retire, self.path(key))
+        await self._purge()
+
+    async def get(self, key: str, fetch: Callable[[str], Awaitable[bool]]) -> Optional[str]:
+        """
+        Путь к локальной копии объекта. fetch(path) скачивает объект в path и возвращает False,
+        если объекта нет; тогда возвращается None.
+        """
+        await self._sync()
+        if key in self._entries:
+            # копию мог вытеснить другой воркер
+            if await run_in_threadpool(_live, self.path(key)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self.path(key)
+            self.size -= self._entries.pop(key)
+
+        self.misses += 1
+        if (loading := self._loading.get(key)) is not None:
+            return await asyncio.shield(loading)
+
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            path = await self._fetch(key, fetch)
+            loading.set_result(path)
+        except BaseException as e:
+            loading.set_exception(e)
+            loading.exception()
+            raise
+        finally:
+            del self._loading[key]
+        return path
+
+    async def _fetch(self, key: str, fetch: Callable[[str], Awaitable[bool]]) -> Optional[str]:
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+        fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=directory, prefix=".fetch-")
+        os.close(fd)
+        try:
+            if not await fetch(tmp_path):
+                return None
+            await run_in_threadpool(os.replace, tmp_path, path)
+        finally:
+            await run_in_threadpool(discard, tmp_path)
+
+        size = (await run_in_threadpool(os.stat, path)).st_size
+        self.size += size - self._entries.get(key, 0)
+        self._entries[key] = size
+        await self._evict()
+        return path
+
+    async def invalidate(self, key: str) -> None:
+        if (size := self._entries.pop(key, None)) is not None:
+            self.size -= size
+        await run_in_threadpool(discard, self.path(key))
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "retired": len(self._retired_at),
+        }
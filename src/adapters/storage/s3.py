@@ -0,0 +1,127 @@
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from src.adapters.storage.disk_cache import DiskCache
+from src.settings import settings
+from src.utils.streaming import discard, digest_stream
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 нужен только для STORAGE_BACKEND=s3
+    boto3 = None
+
+# S3 DeleteObjects принимает не больше 1000 ключей за запрос
+DELETE_BATCH = 1000
+
+
+def _not_found(error: "ClientError") -> bool:
+    return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+class S3Storage:
+    """
+    S3-совместимое объектное хранилище (AWS S3, MinIO, Ceph RGW; для разработки — локальный MinIO
+    через S3_ENDPOINT_URL). Большие файлы загружаются multipart частями по S3_MULTIPART_CHUNK_SIZE
+    прямо из staging, без чтения в память. Для отдачи объект скачивается в локальный DiskCache,
+    поэтому популярные файлы не запрашиваются из хранилища повторно.
+    """
+
+    def __init__(self, bucket: str, options: dict):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        self.bucket = bucket
+        # клиент boto3 потокобезопасен, вызовы выполняются в пуле потоков
+        self.client = boto3.client("s3", **{name: value for name, value in options.items() if value})
+        self.transfer = TransferConfig(
+            multipart_threshold=settings.s3_multipart_chunk_size,
+            multipart_chunksize=settings.s3_multipart_chunk_size,
+            max_concurrency=settings.s3_max_concurrency,
+        )
+        self.cache = DiskCache(settings.storage_cache_dir, settings.storage_cache_bytes)
+
+    remote = True
+
+    def _upload(self, key: str, source: str) -> None:
+        self.client.upload_file(source, self.bucket, key, Config=self.transfer)
+
+    async def put(self, key: str, source: str, keep: bool = False) -> None:
+        await run_in_threadpool(self._upload, key, source)
+        if not keep:
+            await run_in_threadpool(discard, source)
+
+    def _download(self, key: str, destination: str) -> bool:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+            self.client.download_file(self.bucket, key, destination, Config=self.transfer)
+        except ClientError as e:
+            if _not_found(e):
+                return False
+            raise
+        # время изменения копии совпадает с объектом, чтобы Last-Modified не зависел от кэша;
+        # atime — момент скачивания, по нему восстанавливается порядок LRU
+        modified = head["LastModified"].timestamp()
+        os.utime(destination, (time.time(), modified))
+        return True
+
+    async def local_path(self, key: str) -> Optional[str]:
+        async def fetch(destination: str) -> bool:
+            return await run_in_threadpool(self._download, key, destination)
+
+        return await self.cache.get(key, fetch)
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if _not_found(e):
+                return False
+            raise
+        return True
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool(self._exists, key)
+
+    def _digest(self, key: str, chunk_size: int) -> Optional[tuple[str, int, int]]:
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except ClientError as e:
+            if _not_found(e):
+                return None
+            raise
+        try:
+            return digest_stream(body, chunk_size)
+        finally:
+            body.close()
+
+    async def digest(self, key: str, chunk_size: int) -> Optional[tuple[str, int, int]]:
+        # объект читается потоком мимо DiskCache: сверка не вытесняет из кэша популярные файлы
+        return await run_in_threadpool(self._digest, key, chunk_size)
+
+    def _delete(self, keys: list[str]) -> None:
+        for start in range(0, len(keys), DELETE_BATCH):
+            objects = [{"Key": key} for key in keys[start:start + DELETE_BATCH]]
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+
+    async def delete_many(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        await run_in_threadpool(self._delete, keys)
+        for key in keys:
+            await self.cache.invalidate(key)
+
+    async def iter_batches(self, prefix: str, size: int) -> AsyncIterator[list[tuple[str, float]]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = iter(paginator.paginate(Bucket=self.bucket, Prefix=prefix, PaginationConfig={"PageSize": size}))
+        while page := await run_in_threadpool(next, pages, None):
+            if contents := page.get("Contents"):
+                yield [(item["Key"], item["LastModified"].timestamp()) for item in contents]
+
+    def stats(self) -> dict:
+        return {"backend": "s3", "cache": self.cache.stats()}
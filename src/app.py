@@ -1,27 +1,35 @@
+import asyncio
 import traceback
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
-import aioredis
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.memcached import MemcachedBackend
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
 
-from src.router.files import file_router
+from src.adapters.cache.memcached import memcached_client
+from src.router.files import file_router, UPLOAD_BODY_LIMITS
+from src.router.stats import stats_router
+from src.service.quota import recompute_usage
+from src.service.reconciler import reconcile_storage
+from src.service.resumable import cleanup_expired_upload_sessions
 from src.settings import settings
 from src.unit_of_work import UnitOfWork
-from src.utils.exceptions import ResultNotFound, FileSizeExceeded
-import memcache
+from src.utils.body_limit import BodyLimitMiddleware
+from src.utils.exceptions import ResultNotFound, FileSizeExceeded, QuotaExceeded
+from src.utils.periodic import run_periodically
 
 app = FastAPI(
     title="E-notGPT. Files.",
 )
 
 app.include_router(file_router)
+app.include_router(stats_router)
 
+app.add_middleware(BodyLimitMiddleware, limits=UPLOAD_BODY_LIMITS)
+
+# добавленный последним middleware внешний: отказ BodyLimitMiddleware тоже получает заголовки CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -33,11 +41,24 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    client = memcache.Client([settings.memcache_server], debug=0)
-    FastAPICache.init(MemcachedBackend(client), prefix="fastapi-cache")
+    app.state.memcached = memcached_client
     uow = UnitOfWork()
     async with uow:
         await uow.init_db()
+    app.state.background_tasks = [
+        asyncio.create_task(
+            run_periodically(settings.resumable_cleanup_interval, cleanup_expired_upload_sessions)
+        ),
+        asyncio.create_task(run_periodically(settings.reconcile_interval, reconcile_storage)),
+        asyncio.create_task(run_periodically(settings.usage_recompute_interval, recompute_usage)),
+    ]
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in app.state.background_tasks:
+        task.cancel()
+    await app.state.memcached.close()
 
 
 @app.exception_handler(ResultNotFound)
@@ -64,6 +85,14 @@ async def validation_exception_handler(request: Request, exc: FileSizeExceeded):
     )
 
 
+@app.exception_handler(QuotaExceeded)
+async def quota_exception_handler(request: Request, exc: QuotaExceeded):
+    return JSONResponse(
+        status_code=413,
+        content={"status": False, "message": "Превышена квота хранилища"},
+    )
+
+
 @app.exception_handler(Exception)
 async def internal_server_error_handler(request: Request, exc: Exception):
     error_trace = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
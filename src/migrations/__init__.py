@@ -0,0 +1,16 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic.ini")
+
+
+def upgrade_head() -> None:
+    """
+    Применяет все миграции; воркеры, стартующие одновременно, выполняют их по очереди
+    """
+    config = Config(ALEMBIC_INI)
+    # логирование уже настроено приложением, env.py не должен перечитывать его из alembic.ini
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
@@ -0,0 +1,54 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.adapters.database.models.base import Base
+# модели регистрируются в Base.metadata при импорте репозиториев
+import src.adapters.database.repositories  # noqa: F401
+from src.settings import settings
+
+# произвольный ключ pg_advisory_lock, общий для всех экземпляров приложения
+MIGRATION_LOCK = 7_242_019
+
+if context.config.config_file_name is not None and context.config.attributes.get("configure_logger", True):
+    fileConfig(context.config.config_file_name, disable_existing_loggers=False)
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=settings.postgres_url, target_metadata=Base.metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    # пока один воркер применяет миграции, остальные ждут и затем видят актуальную версию.
+    # Блокировка сессионная: autocommit_block (CREATE INDEX CONCURRENTLY) фиксирует транзакцию,
+    # и xact-блокировка снялась бы посреди прохода
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK})
+    connection.commit()
+    try:
+        # каждая ревизия в своей транзакции: ревизии до autocommit_block всё равно фиксируются
+        context.configure(connection=connection, target_metadata=Base.metadata, transaction_per_migration=True)
+        with context.begin_transaction():
+            context.run_migrations()
+    finally:
+        connection.rollback()
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK})
+        connection.commit()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(settings.postgres_url, poolclass=NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
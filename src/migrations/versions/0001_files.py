@@ -0,0 +1,39 @@
+"""files
+
+Исходная схема. На базах, созданных через create_all до появления миграций,
+таблица уже есть — ревизия её не трогает, и дальше применяются только изменения.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("files"):
+        return
+    op.create_table(
+        "files",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+        sa.Column("create_date", sa.TIMESTAMP(), nullable=False),
+        sa.Column("modify_date", sa.TIMESTAMP(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("hash", sa.String(), nullable=False),
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+    )
+    op.create_index("ix_files_user_id", "files", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_files_user_id", table_name="files")
+    op.drop_table("files")
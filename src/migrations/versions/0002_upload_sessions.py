@@ -0,0 +1,58 @@
+"""upload sessions
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # таблицы могли быть созданы create_all до появления миграций
+    if not _has_table("upload_sessions"):
+        op.create_table(
+            "upload_sessions",
+            sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+            sa.Column("create_date", sa.TIMESTAMP(), nullable=False),
+            sa.Column("modify_date", sa.TIMESTAMP(), nullable=False),
+            sa.Column("token", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("type", sa.String(), nullable=False),
+            sa.Column("size", sa.BigInteger(), nullable=False),
+            sa.Column("chunk_size", sa.Integer(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+        )
+        op.create_index("ix_upload_sessions_token", "upload_sessions", ["token"], unique=True)
+        op.create_index("ix_upload_sessions_user_id", "upload_sessions", ["user_id"])
+        op.create_index("ix_upload_sessions_expires_at", "upload_sessions", ["expires_at"])
+    if not _has_table("upload_chunks"):
+        op.create_table(
+            "upload_chunks",
+            sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+            sa.Column("create_date", sa.TIMESTAMP(), nullable=False),
+            sa.Column("modify_date", sa.TIMESTAMP(), nullable=False),
+            sa.Column("session_id", sa.Integer(), sa.ForeignKey("upload_sessions.id"), nullable=False),
+            sa.Column("index", sa.Integer(), nullable=False),
+            sa.Column("offset", sa.BigInteger(), nullable=False),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("checksum", sa.String(), nullable=False),
+            sa.UniqueConstraint("session_id", "index"),
+        )
+        op.create_index("ix_upload_chunks_session_id", "upload_chunks", ["session_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("upload_chunks")
+    op.drop_table("upload_sessions")
@@ -0,0 +1,43 @@
+"""blobs
+
+Содержимое по sha256 и ссылка на него из files.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("blobs"):
+        op.create_table(
+            "blobs",
+            sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+            sa.Column("create_date", sa.TIMESTAMP(), nullable=False),
+            sa.Column("modify_date", sa.TIMESTAMP(), nullable=False),
+            sa.Column("digest", sa.String(64), nullable=False, unique=True),
+            sa.Column("path", sa.String(), nullable=False),
+            sa.Column("size", sa.BigInteger(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+        )
+    columns = {column["name"] for column in inspector.get_columns("files")}
+    if "blob_id" not in columns:
+        op.add_column("files", sa.Column("blob_id", sa.Integer(), sa.ForeignKey("blobs.id"), nullable=True))
+        op.create_index("ix_files_blob_id", "files", ["blob_id"])
+    if "size" not in columns:
+        op.add_column("files", sa.Column("size", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("files", "size")
+    op.drop_index("ix_files_blob_id", table_name="files")
+    op.drop_column("files", "blob_id")
+    op.drop_table("blobs")
@@ -0,0 +1,34 @@
+"""files user listing index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    valid = op.get_bind().execute(sa.text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = 'ix_files_user_listing'"
+    )).scalar()
+    if valid:
+        return
+    # CONCURRENTLY не блокирует запись в files на время построения, но выполняется только вне транзакции
+    with op.get_context().autocommit_block():
+        if valid is False:
+            # прерванное построение оставляет неготовый индекс с тем же именем
+            op.drop_index("ix_files_user_listing", table_name="files", postgresql_concurrently=True)
+        op.create_index("ix_files_user_listing", "files", ["user_id", "type", "is_active", "create_date", "id"],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_files_user_listing", table_name="files", postgresql_concurrently=True)
@@ -0,0 +1,23 @@
+"""blobs.encodings
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("blobs")}
+    if "encodings" not in columns:
+        op.add_column("blobs", sa.Column("encodings", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("blobs", "encodings")
@@ -0,0 +1,23 @@
+"""blobs.crc32
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("blobs")}
+    if "crc32" not in columns:
+        op.add_column("blobs", sa.Column("crc32", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("blobs", "crc32")
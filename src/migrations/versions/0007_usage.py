@@ -0,0 +1,35 @@
+"""usage
+
+Счётчики объёма пользователей; заполняются периодическим пересчётом recompute_usage.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("usage"):
+        return
+    op.create_table(
+        "usage",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+        sa.Column("create_date", sa.TIMESTAMP(), nullable=False),
+        sa.Column("modify_date", sa.TIMESTAMP(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("bytes", sa.BigInteger(), nullable=False),
+        sa.Column("files", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("user_id", "type"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usage")
@@ -0,0 +1,23 @@
+"""files.crc32
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("files")}
+    if "crc32" not in columns:
+        op.add_column("files", sa.Column("crc32", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("files", "crc32")
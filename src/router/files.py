@@ -1,21 +1,39 @@
-from typing import Annotated
+from typing import Annotated, Optional, Literal
 
-import memcache
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import APIRouter, Depends, UploadFile, File, Request, Header, Query
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.memcached import MemcachedBackend
-from fastapi_cache.decorator import cache
 
 from src.service.file import PhotoFileUploadService, VideoFileUploadService, AudioFileUploadService, \
     DocumentFileUploadService, PhotoFileResponseService, VideoFileResponseService, AudioFileResponseService, \
-    DocumentFileResponseService, APKFileUploadService, APKFileResponseService
-from src.unit_of_work import UnitOfWork
+    DocumentFileResponseService, APKFileUploadService, APKFileResponseService, FileBatchUpload
+from src.service.resumable import ResumableUpload
+from src.schemas.file import UploadSessionInput
+from src.settings import settings
+from src.unit_of_work import UnitOfWork, ReadOnlyUnitOfWork
 
 file_router = APIRouter()
 security = HTTPBearer()
 
 
+def _batch_limit(service) -> int:
+    # отдельный общий лимит: иначе один запрос мог бы держать до MAX_FILE_SIZE * UPLOAD_BATCH_MAX_FILES на диске
+    return min(service.MAX_FILE_SIZE * settings.upload_batch_max_files, settings.upload_batch_max_size)
+
+
+UPLOAD_BODY_LIMITS = {
+    "/upload/photo": PhotoFileUploadService.MAX_FILE_SIZE,
+    "/upload/video": VideoFileUploadService.MAX_FILE_SIZE,
+    "/upload/audio": AudioFileUploadService.MAX_FILE_SIZE,
+    "/upload/document": DocumentFileUploadService.MAX_FILE_SIZE,
+    "/upload/mobile": APKFileUploadService.MAX_FILE_SIZE,
+    "/upload/photo/batch": _batch_limit(PhotoFileUploadService),
+    "/upload/video/batch": _batch_limit(VideoFileUploadService),
+    "/upload/audio/batch": _batch_limit(AudioFileUploadService),
+    "/upload/document/batch": _batch_limit(DocumentFileUploadService),
+    "/upload/mobile/batch": _batch_limit(APKFileUploadService),
+}
+
+
 @file_router.post("/upload/photo", tags=["Upload"])
 async def upload_photo(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
                        file: UploadFile = File(...),
@@ -55,63 +73,235 @@ async def upload_photo(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
     async with uow:
         return await APKFileUploadService(uow, file, token, protected=True, available_roles=['*']).upload()
 
-@file_router.get("/files/photos/{hashed}", tags=["Download"])
-@cache(expire=60*24*7)
-async def files_get_photo(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)]):
+
+@file_router.post("/upload/photo/batch", tags=["Batch upload"])
+async def upload_photo_batch(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                             files: list[UploadFile] = File(...),
+                             token: HTTPAuthorizationCredentials = Depends(security)):
     async with uow:
-        return await PhotoFileResponseService(uow).get_file(hashed)
+        return await FileBatchUpload(uow, PhotoFileUploadService, files, token, protected=True,
+                                     available_roles=['*']).upload()
 
 
-@file_router.get("/files/videos/{hashed}", tags=["Download"])
-@cache(expire=60*24*7)
-async def files_get_video(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)]):
+@file_router.post("/upload/video/batch", tags=["Batch upload"])
+async def upload_video_batch(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                             files: list[UploadFile] = File(...),
+                             token: HTTPAuthorizationCredentials = Depends(security)):
     async with uow:
-        return await VideoFileResponseService(uow).get_file(hashed)
+        return await FileBatchUpload(uow, VideoFileUploadService, files, token, protected=True,
+                                     available_roles=['*']).upload()
 
 
-@file_router.get("/files/audios/{hashed}", tags=["Download"])
-@cache(expire=60*24*7)
-async def files_get_audio(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)]):
+@file_router.post("/upload/audio/batch", tags=["Batch upload"])
+async def upload_audio_batch(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                             files: list[UploadFile] = File(...),
+                             token: HTTPAuthorizationCredentials = Depends(security)):
     async with uow:
-        return await AudioFileResponseService(uow).get_file(hashed)
+        return await FileBatchUpload(uow, AudioFileUploadService, files, token, protected=True,
+                                     available_roles=['*']).upload()
 
 
-@file_router.get("/files/documents/{hashed}", tags=["Download"])
-@cache(expire=60*24*7)
-async def files_get_photo(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)]):
+@file_router.post("/upload/document/batch", tags=["Batch upload"])
+async def upload_document_batch(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                                files: list[UploadFile] = File(...),
+                                token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await FileBatchUpload(uow, DocumentFileUploadService, files, token, protected=True,
+                                     available_roles=['*']).upload()
+
+
+@file_router.post("/upload/mobile/batch", tags=["Batch upload"])
+async def upload_mobile_batch(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                              files: list[UploadFile] = File(...),
+                              token: HTTPAuthorizationCredentials = Depends(security)):
     async with uow:
-        return await DocumentFileResponseService(uow).get_file(hashed)
+        return await FileBatchUpload(uow, APKFileUploadService, files, token, protected=True,
+                                     available_roles=['*']).upload()
+
+
+@file_router.post("/upload/video/sessions", tags=["Resumable upload"])
+async def upload_video_session(data: UploadSessionInput,
+                               uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                               token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await ResumableUpload(uow, token, protected=True).create(VideoFileUploadService, data)
+
+
+@file_router.post("/upload/mobile/sessions", tags=["Resumable upload"])
+async def upload_mobile_session(data: UploadSessionInput,
+                                uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                                token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await ResumableUpload(uow, token, protected=True).create(APKFileUploadService, data)
+
+
+@file_router.get("/upload/sessions/{session}", tags=["Resumable upload"])
+async def upload_session_status(session: str,
+                                uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                                token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await ResumableUpload(uow, token, protected=True).status(session)
+
+
+@file_router.put("/upload/sessions/{session}/chunks/{index}", tags=["Resumable upload"])
+async def upload_session_chunk(session: str, index: int, request: Request,
+                               uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                               checksum: Annotated[str, Header(alias="X-Chunk-Checksum")],
+                               token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await ResumableUpload(uow, token, protected=True).put_chunk(session, index, checksum,
+                                                                           request.stream())
+
+
+@file_router.post("/upload/sessions/{session}/finalize", tags=["Resumable upload"])
+async def upload_session_finalize(session: str,
+                                  uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                                  token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await ResumableUpload(uow, token, protected=True).finalize(session)
+
+
+@file_router.get("/files/photos/{hashed}", tags=["Download"])
+async def files_get_photo(hashed: str, request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                          w: Annotated[Optional[int], Query(gt=0)] = None,
+                          fmt: Optional[Literal["jpeg", "png", "webp"]] = None):
+    service = PhotoFileResponseService(uow)
+    if w is not None or fmt is not None:
+        return await service.get_variant(hashed, w, fmt, request.headers, request.query_params,
+                                         request.client and request.client.host)
+    return await service.get_file(hashed, request.headers, request.query_params,
+                                  request.client and request.client.host)
+
+
+@file_router.get("/files/videos/{hashed}", tags=["Download"])
+async def files_get_video(hashed: str, request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)]):
+    return await VideoFileResponseService(uow).get_file(hashed, request.headers, request.query_params,
+                                                        request.client and request.client.host)
+
+
+@file_router.get("/files/audios/{hashed}", tags=["Download"])
+async def files_get_audio(hashed: str, request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)]):
+    return await AudioFileResponseService(uow).get_file(hashed, request.headers, request.query_params,
+                                                        request.client and request.client.host)
+
+
+@file_router.get("/files/documents/{hashed}", tags=["Download"])
+async def files_get_photo(hashed: str, request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)]):
+    return await DocumentFileResponseService(uow).get_file(hashed, request.headers, request.query_params,
+                                                           request.client and request.client.host)
 
 @file_router.get("/files/mobiles/{hashed}", tags=["Download"])
-@cache(expire=60*24*7)
-async def files_get_photo(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)]):
+async def files_get_photo(hashed: str, request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)]):
+    return await APKFileResponseService(uow).get_file(hashed, request.headers, request.query_params,
+                                                      request.client and request.client.host)
+
+
+@file_router.delete("/files/photos/{hashed}", tags=["Delete"])
+async def files_delete_photo(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                             token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await PhotoFileResponseService(uow, token, protected=True).deactivate(hashed)
+
+
+@file_router.delete("/files/videos/{hashed}", tags=["Delete"])
+async def files_delete_video(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                             token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await VideoFileResponseService(uow, token, protected=True).deactivate(hashed)
+
+
+@file_router.delete("/files/audios/{hashed}", tags=["Delete"])
+async def files_delete_audio(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                             token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await AudioFileResponseService(uow, token, protected=True).deactivate(hashed)
+
+
+@file_router.delete("/files/documents/{hashed}", tags=["Delete"])
+async def files_delete_document(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                                token: HTTPAuthorizationCredentials = Depends(security)):
     async with uow:
-        return await APKFileResponseService(uow).get_file(hashed)
+        return await DocumentFileResponseService(uow, token, protected=True).deactivate(hashed)
+
+
+@file_router.delete("/files/mobiles/{hashed}", tags=["Delete"])
+async def files_delete_mobile(hashed: str, uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+                              token: HTTPAuthorizationCredentials = Depends(security)):
+    async with uow:
+        return await APKFileResponseService(uow, token, protected=True).deactivate(hashed)
 
 
 @file_router.get("/files/photo/all", tags=["Get all"])
-async def photos_all(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+async def photos_all(uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                     cursor: Optional[str] = None,
+                     limit: Annotated[Optional[int], Query(gt=0)] = None,
+                     format: Literal["json", "ndjson"] = "json",
                      token: HTTPAuthorizationCredentials = Depends(security)):
+    service = PhotoFileResponseService(uow, token, protected=True)
+    if format == "ndjson":
+        return await service.stream_my_files()
     async with uow:
-        return await PhotoFileResponseService(uow, token, protected=True).get_my_files()
+        return await service.get_my_files(cursor, limit)
 
 
 @file_router.get("/files/video/all", tags=["Get all"])
-async def videos_all(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+async def videos_all(uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                     cursor: Optional[str] = None,
+                     limit: Annotated[Optional[int], Query(gt=0)] = None,
+                     format: Literal["json", "ndjson"] = "json",
                      token: HTTPAuthorizationCredentials = Depends(security)):
+    service = VideoFileResponseService(uow, token, protected=True)
+    if format == "ndjson":
+        return await service.stream_my_files()
     async with uow:
-        return await VideoFileResponseService(uow, token, protected=True).get_my_files()
+        return await service.get_my_files(cursor, limit)
 
 
 @file_router.get("/files/audio/all", tags=["Get all"])
-async def audios_all(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+async def audios_all(uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                     cursor: Optional[str] = None,
+                     limit: Annotated[Optional[int], Query(gt=0)] = None,
+                     format: Literal["json", "ndjson"] = "json",
                      token: HTTPAuthorizationCredentials = Depends(security)):
+    service = AudioFileResponseService(uow, token, protected=True)
+    if format == "ndjson":
+        return await service.stream_my_files()
     async with uow:
-        return await AudioFileResponseService(uow, token, protected=True).get_my_files()
+        return await service.get_my_files(cursor, limit)
 
 
 @file_router.get("/files/document/all", tags=["Get all"])
-async def documents_all(uow: Annotated[UnitOfWork, Depends(UnitOfWork)],
+async def documents_all(uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                     cursor: Optional[str] = None,
+                     limit: Annotated[Optional[int], Query(gt=0)] = None,
+                     format: Literal["json", "ndjson"] = "json",
                      token: HTTPAuthorizationCredentials = Depends(security)):
+    service = DocumentFileResponseService(uow, token, protected=True)
+    if format == "ndjson":
+        return await service.stream_my_files()
     async with uow:
-        return await DocumentFileResponseService(uow, token, protected=True).get_my_files()
+        return await service.get_my_files(cursor, limit)
+
+
+@file_router.get("/files/photo/export", tags=["Export"])
+async def photos_export(request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                        token: HTTPAuthorizationCredentials = Depends(security)):
+    return await PhotoFileResponseService(uow, token, protected=True).export_my_files(request.headers)
+
+
+@file_router.get("/files/video/export", tags=["Export"])
+async def videos_export(request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                        token: HTTPAuthorizationCredentials = Depends(security)):
+    return await VideoFileResponseService(uow, token, protected=True).export_my_files(request.headers)
+
+
+@file_router.get("/files/audio/export", tags=["Export"])
+async def audios_export(request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                        token: HTTPAuthorizationCredentials = Depends(security)):
+    return await AudioFileResponseService(uow, token, protected=True).export_my_files(request.headers)
+
+
+@file_router.get("/files/document/export", tags=["Export"])
+async def documents_export(request: Request, uow: Annotated[UnitOfWork, Depends(ReadOnlyUnitOfWork)],
+                           token: HTTPAuthorizationCredentials = Depends(security)):
+    return await DocumentFileResponseService(uow, token, protected=True).export_my_files(request.headers)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from src.adapters.storage.backends import get_storage
+from src.settings import settings
+from src.utils.Authorization import Authorization
+from src.utils.download_cache import download_cache
+from src.utils.images import variant_cache
+from src.utils.metrics import connection_hold_time
+from src.utils.token_cache import verified_tokens
+
+stats_router = APIRouter()
+security = HTTPBearer()
+
+
+@stats_router.get("/stats", tags=["Stats"])
+async def stats(token: HTTPAuthorizationCredentials = Depends(security)):
+    # размеры кэшей и хранилища — внутренние сведения, доступны только администраторам
+    Authorization(token, protected=True, available_roles=[settings.stats_role])
+    return {
+        "download_cache": download_cache.stats(),
+        "jwt_cache": verified_tokens.stats(),
+        "connection_hold_time": connection_hold_time.stats(),
+        "storage": get_storage().stats(),
+        "image_variants": variant_cache.stats(),
+    }
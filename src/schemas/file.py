@@ -1,6 +1,7 @@
 from datetime import datetime
+from typing import Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class SuccessResponse(BaseModel):
@@ -12,6 +13,17 @@ class FileUploadOutput(SuccessResponse):
     url: str
 
 
+class BatchUploadItem(BaseModel):
+    name: str
+    status: bool = True
+    url: Optional[str] = None
+    message: Optional[str] = None
+
+
+class BatchUploadOutput(SuccessResponse):
+    items: list[BatchUploadItem]
+
+
 class DataFile(BaseModel):
     id: int
     name: str
@@ -21,4 +33,23 @@ class DataFile(BaseModel):
 
 class AllFilesOutput(SuccessResponse):
     items: list["DataFile"]
+    next_cursor: Optional[str] = None
+
+
+class UploadSessionInput(BaseModel):
+    name: str
+    size: int = Field(gt=0)
+
+
+class UploadSessionOutput(SuccessResponse):
+    session: str
+    chunk_size: int
+    chunks: int
+    expires_at: datetime
+    received: list[int] = []
+
 
+class UploadChunkOutput(SuccessResponse):
+    index: int
+    offset: int
+    size: int
@@ -1,17 +1,44 @@
-import hashlib
+import asyncio
+import dataclasses
+import mimetypes
 import os
-from http.client import HTTPException
 from pathlib import Path
+from typing import AsyncIterator
 
-from fastapi import UploadFile
+from fastapi import UploadFile, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
-from starlette.responses import FileResponse, JSONResponse
-
-from src.schemas.file import FileUploadOutput, DataFile, AllFilesOutput
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import Response, StreamingResponse
+
+from src.adapters.storage.backends import get_storage
+from src.adapters.storage.blobs import blob_store
+from src.schemas.file import FileUploadOutput, SuccessResponse, BatchUploadOutput, BatchUploadItem
+from src.service import quota
 from src.settings import settings
 from src.unit_of_work import UnitOfWork
 from src.utils.Authorization import Authorization
-from src.utils.exceptions import FileSizeExceeded
+from src.utils.exceptions import FileSizeExceeded, ResultNotFound
+from src.utils.download_cache import download_cache
+from src.utils.file_responses import not_modified, file_response, offload_response, archive_response
+from src.utils.layout import sharded_key, legacy_path
+from src.utils.metadata_cache import FileMeta, file_metadata_cache
+from src.utils.record_cache import file_record_cache
+from src.utils.pagination import encode_cursor, decode_cursor
+from src.utils.serialization import files_page_json, files_ndjson
+from src.utils.signing import file_url, verify_signature
+from src.utils.storage_keys import get_key_generator
+from src.utils import compression, images
+from src.utils.streaming import stage_upload, digest_upload, digest_file, discard
+from src.utils.zip_stream import ZipEntry, ZipLayout
+
+
+async def invalidate_file(type_name: str, hashed: str) -> None:
+    """
+    Сбрасывает метаданные ключа после загрузки или деактивации: в этом воркере и в общем кэше memcached
+    """
+    file_metadata_cache.invalidate(type_name, hashed)
+    await file_record_cache.invalidate(type_name, hashed)
 
 
 class FileUpload(Authorization):
@@ -21,8 +48,15 @@ class FileUpload(Authorization):
         self.file = file
         self.filename = self.file.filename
         self.extension = self._get_extension()
-        self.hash = self._hash_name()
-        self.save_path = settings.file_storage + self.TYPE_NAME
+        self.hash = None
+        self.digest = None
+        self.size = None
+        self.crc32 = None
+        self.staged = None
+        self.encoded: dict[str, str] = {}
+        self.encodings = None
+        # содержимое подготовлено в staging (и передано в удалённое хранилище) до транзакции
+        self.saved = False
         self._extensions()
 
         if self._file_size() >= self.MAX_FILE_SIZE * 1024 * 1024:
@@ -31,6 +65,8 @@ class FileUpload(Authorization):
     MAX_FILE_SIZE: int
     TYPE_NAME: str
     AVAILABLE_EXTENSIONS: list[str]
+    # для этих расширений рядом с содержимым сохраняются сжатые копии
+    COMPRESSIBLE_EXTENSIONS: list[str] = []
 
     def _file_size(self):
         return self.file.size
@@ -38,38 +74,123 @@ class FileUpload(Authorization):
     def _get_extension(self):
         return Path(self.filename).suffix
 
-    def _hash_name(self):
-        return (salt := os.urandom(16)).hex() + ':' + hashlib.pbkdf2_hmac('sha256', self.filename.encode(),
-                                                                          salt, 100000).hex()[:64] + self.extension
+    @classmethod
+    async def _hash_name(cls, filename: str, extension: str):
+        return await get_key_generator().generate(filename, extension)
 
-    def _generate_url(self):
-        return settings.file_server_url + "files/" + self.TYPE_NAME + "/" + self.hash
+    def _generate_url(self, digest: str = None):
+        return file_url(self.TYPE_NAME, self.hash, digest)
 
     def _extensions(self):
         if self.extension not in self.AVAILABLE_EXTENSIONS:
             raise HTTPException(403, f"Extension error. Available: {self.AVAILABLE_EXTENSIONS}")
 
-    async def _save(self):
-        os.makedirs(self.save_path, exist_ok=True)
-        file_path = os.path.join(self.save_path, self.hash)
-        with open(file_path, "wb") as f:
-            f.write(await self.file.read())
-
-        return file_path
+    async def _save(self, blob):
+        # содержимое готовится во временном файле, на место его переносит _publish перед commit
+        if self.staged is None:
+            self.staged = await stage_upload(self.file, blob_store.staging, settings.upload_chunk_size)
+        if self.extension.lower() in self.COMPRESSIBLE_EXTENSIONS:
+            self.encoded = await compression.precompress(self.staged.path, self.size)
+            self.encodings = ",".join(self.encoded) or None
+        self.saved = True
+
+    def _encodings(self):
+        return self.encodings
+
+    async def _publish(self):
+        key = blob_store.key(self.digest)
+        # сжатые копии появляются раньше содержимого, чтобы blob никогда не ссылался на отсутствующую копию
+        for encoding, path in self.encoded.items():
+            await get_storage().put(blob_store.encoded_key(key, encoding), path)
+        self.encoded = {}
+        if self.staged is not None:
+            await get_storage().put(key, self.staged.path)
+            self.staged = None
+
+    async def _discard(self):
+        for path in self.encoded.values():
+            await run_in_threadpool(discard, path)
+        self.encoded = {}
+        if self.staged is not None:
+            await run_in_threadpool(discard, self.staged.path)
+            self.staged = None
+
+    async def _save_ahead(self):
+        """
+        Новое содержимое пишется в staging и сжимается до транзакции, чтобы соединение из пула
+        и блокировка строки blob не держались на время записи; в транзакции остаётся только перенос
+        на место. Удалённому хранилищу содержимое передаётся сразу. Уже хранящееся содержимое не пишется.
+        """
+        storage = get_storage()
+        if await storage.exists(blob_store.key(self.digest)):
+            return
+        await self._save(None)
+        if storage.remote:
+            await self._publish()
+
+    def _transforms(self) -> bool:
+        return False
+
+    async def _transform(self, path: str) -> None:
+        """
+        Обработка содержимого в staging до подсчёта sha256 (если _transforms() возвращает True)
+        """
+
+    async def _prepare(self):
+        """
+        Ключ файла, sha256 и размер содержимого — без обращения к БД
+        """
+        self.hash = await self._hash_name(self.filename, self.extension)
+        if not self._transforms():
+            self.digest, self.size, self.crc32 = await digest_upload(self.file, settings.upload_chunk_size)
+            return
+        # содержимое меняется до подсчёта sha256, поэтому файл сразу пишется в staging
+        self.staged = await stage_upload(self.file, blob_store.staging, settings.upload_chunk_size)
+        await self._transform(self.staged.path)
+        self.digest, self.size, self.crc32 = await digest_file(self.staged.path, settings.upload_chunk_size)
+
+    def _record(self, blob):
+        return {
+            "name": self.filename,
+            "hash": self.hash,
+            "path": blob.path,
+            "type": self.TYPE_NAME,
+            "user_id": self.user_id,
+            "blob_id": blob.id,
+            "size": self.size
+        }
+
+    async def _store(self):
+        """
+        Кладёт содержимое в хранилище и возвращает запись для таблицы files (ещё не добавленную)
+        """
+        await self._prepare()
+        await self._save_ahead()
+        blob = await self.uow.repositories.blob.acquire(self.digest, blob_store.key(self.digest), self.size,
+                                                        self.crc32)
+        # такое содержимое уже хранится — на диск ничего не пишем
+        if blob.ref_count == 1:
+            # объект, найденный до транзакции, мог оказаться брошенным: пишем его заново под блокировкой
+            if not self.saved:
+                await self._save(blob)
+            if self._encodings():
+                await self.uow.repositories.blob.edit_one(blob.id, {"encodings": self._encodings()})
+        return self._record(blob)
 
     async def upload(self):
-        file = await self.uow.repositories.file.add_one(
-            {
-                "name": self.filename,
-                "hash": self.hash,
-                "path": self.save_path,
-                "type": self.TYPE_NAME,
-                "user_id": self.user_id
-            }
-        )
-        await self.uow.commit()
-        await self._save()
-        return FileUploadOutput(url=self._generate_url())
+        await quota.check(self.uow, self.user_id, self._file_size())
+        try:
+            await self.uow.repositories.file.add_one(await self._store())
+            # строки уже записаны в транзакции: файл встаёт на место только непосредственно перед commit,
+            # поэтому после сбоя возможен лишний файл без строки, но не строка без файла
+            await quota.charge(self.uow, self.user_id, self.TYPE_NAME, self.size)
+            await self._publish()
+            await self.uow.commit()
+        finally:
+            await self._discard()
+        # ключ мог быть закэширован как отсутствующий или указывать на прошлую загрузку (APK)
+        await invalidate_file(self.TYPE_NAME, self.hash)
+        return FileUploadOutput(url=self._generate_url(self.digest))
 
 
 class PhotoFileUploadService(FileUpload):
@@ -80,6 +201,12 @@ class PhotoFileUploadService(FileUpload):
     def __init__(self, uow: UnitOfWork, file: UploadFile, token: HTTPAuthorizationCredentials, **kwargs):
         super().__init__(uow, file, token, **kwargs)
 
+    def _transforms(self):
+        return settings.image_optimize and images.optimizable(self.extension)
+
+    async def _transform(self, path: str):
+        await images.optimize(path)
+
 
 class VideoFileUploadService(FileUpload):
     MAX_FILE_SIZE = 75
@@ -103,6 +230,8 @@ class DocumentFileUploadService(FileUpload):
     MAX_FILE_SIZE = 5
     TYPE_NAME = "documents"
     AVAILABLE_EXTENSIONS = [".txt", ".pdf", ".env"]
+    # PDF уже сжат внутри, повторное сжатие почти ничего не даёт
+    COMPRESSIBLE_EXTENSIONS = [".txt", ".env"]
 
     def __init__(self, uow: UnitOfWork, file: UploadFile, token: HTTPAuthorizationCredentials, **kwargs):
         super().__init__(uow, file, token, **kwargs)
@@ -115,7 +244,146 @@ class APKFileUploadService(FileUpload):
 
     def __init__(self, uow: UnitOfWork, file: UploadFile, token: HTTPAuthorizationCredentials, **kwargs):
         super().__init__(uow, file, token, **kwargs)
-        self.hash = file.filename
+
+    @classmethod
+    async def _hash_name(cls, filename: str, extension: str):
+        return filename
+
+
+class FileBatchUpload(Authorization):
+    """
+    Загрузка нескольких файлов одного типа: токен проверяется один раз, расширения и размеры
+    всех файлов — до начала записи. Хэши и запись на диск идут параллельно (не больше
+    UPLOAD_BATCH_CONCURRENCY одновременно), записи files добавляются одним INSERT в одной транзакции.
+    Ошибка одного файла не отменяет остальные: результат возвращается по каждому файлу.
+    """
+
+    def __init__(self, uow: UnitOfWork, service: type[FileUpload], files: list[UploadFile],
+                 token: HTTPAuthorizationCredentials, **kwargs):
+        super().__init__(token, **kwargs)
+        if len(files) > settings.upload_batch_max_files:
+            raise HTTPException(400, f"Слишком много файлов. Максимум: {settings.upload_batch_max_files}")
+        self.uow = uow
+        self.items = [BatchUploadItem(name=file.filename or "") for file in files]
+        self.uploads: dict[int, FileUpload] = {}
+        self.prepared: list[FileUpload] = []
+        for index, file in enumerate(files):
+            try:
+                upload = service(uow, file, None)
+            except HTTPException as e:
+                self._fail(index, e.detail)
+                continue
+            except FileSizeExceeded:
+                self._fail(index, "Допустимый размер файла превышен")
+                continue
+            upload.user_id = self.user_id
+            self.uploads[index] = upload
+            self.prepared.append(upload)
+        self._slots = asyncio.Semaphore(settings.upload_batch_concurrency)
+
+    async def _bounded(self, job):
+        async with self._slots:
+            return await job
+
+    def _fail(self, index: int, message: str):
+        self.items[index].status = False
+        self.items[index].message = message
+        self.uploads.pop(index, None)
+
+    async def _gather(self, jobs: dict[int, object]) -> dict[int, BaseException]:
+        results = await asyncio.gather(*(self._bounded(job) for job in jobs.values()), return_exceptions=True)
+        return {index: result for index, result in zip(jobs, results) if isinstance(result, Exception)}
+
+    def _first_by_digest(self) -> dict[str, int]:
+        # тот же порядок, что и в _acquire_blobs: содержимое пишет первый файл с таким digest
+        first = {}
+        for index, upload in sorted(self.uploads.items(), key=lambda item: item[1].digest):
+            first.setdefault(upload.digest, index)
+        return first
+
+    async def _save_ahead(self):
+        first = self._first_by_digest()
+        failed = await self._gather({index: self.uploads[index]._save_ahead() for index in first.values()})
+        failed_digests = {self.uploads[index].digest for index in failed}
+        for index, upload in list(self.uploads.items()):
+            if upload.digest in failed_digests:
+                self._fail(index, "Не удалось сохранить файл")
+
+    async def _acquire_blobs(self) -> dict[str, tuple[int, object, bool]]:
+        """
+        digest -> (индекс файла, который пишет содержимое, blob, нужно ли писать на диск)
+        """
+        blobs = {}
+        # строки blobs блокируются в порядке digest, чтобы параллельные пакеты не ждали друг друга по кругу
+        for index, upload in sorted(self.uploads.items(), key=lambda item: item[1].digest):
+            blob = await self.uow.repositories.blob.acquire(upload.digest, blob_store.key(upload.digest), upload.size,
+                                                            upload.crc32)
+            # одинаковое содержимое внутри пакета пишет только первый файл
+            if upload.digest not in blobs:
+                blobs[upload.digest] = (index, blob, blob.ref_count == 1)
+        return blobs
+
+    async def upload(self):
+        try:
+            return await self._upload()
+        finally:
+            for upload in self.prepared:
+                await upload._discard()
+
+    async def _check_quota(self):
+        quota_bytes = settings.user_quota_bytes
+        if not quota_bytes:
+            return
+        # файлы, не помещающиеся в квоту, отклоняются по порядку до начала записи
+        used = await self.uow.repositories.usage.find_total(self.user_id)
+        # соединение не держится, пока файлы хэшируются и пишутся
+        await self.uow.rollback()
+        for index, upload in list(self.uploads.items()):
+            if used + upload._file_size() > quota_bytes:
+                self._fail(index, "Превышена квота хранилища")
+            else:
+                used += upload._file_size()
+
+    async def _upload(self):
+        await self._check_quota()
+        for index, error in (await self._gather({i: u._prepare() for i, u in self.uploads.items()})).items():
+            self._fail(index, error.detail if isinstance(error, HTTPException) else "Не удалось прочитать файл")
+
+        await self._save_ahead()
+        blobs = await self._acquire_blobs()
+        writes = {index: self.uploads[index]._save(blob) for index, blob, created in blobs.values()
+                  if created and not self.uploads[index].saved}
+        failed_digests = {self.uploads[index].digest for index in await self._gather(writes)}
+        records = []
+        for index, upload in list(self.uploads.items()):
+            if upload.digest in failed_digests:
+                self._fail(index, "Не удалось сохранить файл")
+                continue
+            records.append(upload._record(blobs[upload.digest][1]))
+
+        if records:
+            await self.uow.repositories.file.add_many(records)
+        encoded = [{"id": blob.id, "encodings": self.uploads[index]._encodings()}
+                   for index, blob, created in blobs.values()
+                   if created and index in self.uploads and self.uploads[index]._encodings()]
+        await self.uow.repositories.blob.edit_many(encoded)
+        # blob, содержимое которых записать не удалось, остаются без ссылок
+        if failed_digests:
+            await self.uow.repositories.blob.edit_many(
+                [{"id": blobs[digest][1].id, "ref_count": 0} for digest in failed_digests]
+            )
+        if self.uploads:
+            service = next(iter(self.uploads.values()))
+            await quota.charge(self.uow, self.user_id, service.TYPE_NAME,
+                               sum(upload.size for upload in self.uploads.values()), len(self.uploads))
+        # ошибка переноса любого файла откатывает всю транзакцию
+        await asyncio.gather(*(self._bounded(upload._publish()) for upload in self.uploads.values()))
+        await self.uow.commit()
+
+        for index, upload in self.uploads.items():
+            await invalidate_file(upload.TYPE_NAME, upload.hash)
+            self.items[index].url = upload._generate_url(upload.digest)
+        return BatchUploadOutput(status=bool(self.uploads), items=self.items)
 
 
 class ResponseFile(Authorization):
@@ -123,43 +391,249 @@ class ResponseFile(Authorization):
         super().__init__(token, **kwargs)
         self.hashed = None
         self.uow = uow
+        # адрес соединения: от него зависит, доверять ли X-Sendfile-Type
+        self.client = None
 
     TYPE_NAME: str
-
-    def _generate_path(self):
-        return settings.file_storage + "/" + self.TYPE_NAME + "/" + self.hashed
-
-    async def _generate_url(self):
-        return settings.file_server_url + "files/" + self.TYPE_NAME + "/" + self.hashed
-
-    async def get_file(self, hashed):
+    # ключ файла выдаётся один раз на загрузку и больше не адресует другое содержимое,
+    # поэтому ответ по нему кэшируется навсегда
+    IMMUTABLE_KEYS = True
+
+    async def _generate_path(self, hashed: str = None, stored: str = None):
+        return await run_in_threadpool(legacy_path, self.TYPE_NAME, hashed or self.hashed, stored)
+
+    async def _resolve_path(self, record: dict):
+        if record["blob_id"] is not None:
+            return await get_storage().local_path(record["path"])
+        return await self._generate_path(stored=record["path"])
+
+    async def _find_record(self) -> dict:
+        async with self.uow:
+            try:
+                file, digest, encodings = await self.uow.repositories.file.find_latest_with_digest(
+                    hash=self.hashed, type=self.TYPE_NAME, is_active=True
+                )
+            except ResultNotFound:
+                return {}
+        return {"blob_id": file.blob_id, "path": file.path, "digest": digest, "encodings": encodings}
+
+    async def _load_metadata(self):
+        record = await file_record_cache.get(self.TYPE_NAME, self.hashed)
+        if record is None:
+            record = await self._find_record()
+            await file_record_cache.set(self.TYPE_NAME, self.hashed, record)
+        if not record:
+            return FileMeta(path=None, type=self.TYPE_NAME, is_active=False)
+        key = record["path"] if record["blob_id"] is not None else None
+        encodings = tuple(record["encodings"].split(",")) if record["encodings"] else ()
+        return await self._stat_metadata(await self._resolve_path(record), record["digest"], key, encodings,
+                                         immutable=self.IMMUTABLE_KEYS)
+
+    async def _stat_metadata(self, path, digest, key=None, encodings=(), immutable=False):
+        if path is None:
+            return FileMeta(path=None, type=self.TYPE_NAME, is_active=False)
+        try:
+            stat_result = await run_in_threadpool(os.stat, path)
+        except FileNotFoundError:
+            return FileMeta(path=None, type=self.TYPE_NAME, is_active=False)
+        # у blob нет расширения, тип содержимого берём из ключа файла
+        return FileMeta(path=path, type=self.TYPE_NAME, is_active=True,
+                        size=stat_result.st_size, mtime=stat_result.st_mtime,
+                        media_type=mimetypes.guess_type(self.hashed)[0] or "application/octet-stream",
+                        digest=digest, key=key, encodings=encodings, immutable=immutable)
+
+    async def _metadata(self):
+        meta = file_metadata_cache.get(self.TYPE_NAME, self.hashed)
+        if meta is None:
+            # сессия UnitOfWork открывается только при промахе кэша
+            meta = await self._load_metadata()
+            file_metadata_cache.set(self.hashed, meta)
+        return meta
+
+    async def _signed_metadata(self, query: QueryParams):
+        # подписанная ссылка: ни БД, ни кэша, путь вычисляется из ключа или sha256 содержимого
+        digest = verify_signature(self.TYPE_NAME, self.hashed, query)
+        if digest is None:
+            return await self._stat_metadata(await self._generate_path(), None, immutable=self.IMMUTABLE_KEYS)
+        key = blob_store.key(digest)
+        return await self._stat_metadata(await get_storage().local_path(key), digest, key, immutable=True)
+
+    async def _active_metadata(self, hashed, query: QueryParams = None):
+        self.hashed = hashed
+        if settings.signed_urls and query and "sig" in query:
+            meta = await self._signed_metadata(query)
+        else:
+            meta = await self._metadata()
+        if not meta.is_active:
+            raise ResultNotFound
+        return meta
+
+    async def get_file(self, hashed, headers: Headers = None, query: QueryParams = None, client: str = None):
+        self.client = client
+        return await self._respond(headers or Headers(), await self._active_metadata(hashed, query))
+
+    async def _encoded_metadata(self, meta: FileMeta, encoding: str):
+        """
+        Метаданные сжатой копии: свой размер и ETag, Last-Modified как у исходного файла.
+        None — копии нет, отдаётся исходный файл.
+        """
+        key = blob_store.encoded_key(meta.key, encoding)
+        if (path := await get_storage().local_path(key)) is None:
+            return None
+        try:
+            stat_result = await run_in_threadpool(os.stat, path)
+        except FileNotFoundError:
+            return None
+        return dataclasses.replace(meta, path=path, size=stat_result.st_size, digest=f"{meta.digest}-{encoding}",
+                                   key=key, encodings=())
+
+    async def _respond(self, headers: Headers, meta: FileMeta):
+        encoding = encoded = None
+        # Range относится к исходным байтам, поэтому сжатые копии отдаются только целиком
+        if meta.encodings and "range" not in headers:
+            if (encoding := compression.negotiate(headers.get("accept-encoding"), meta.encodings)) is not None:
+                encoded = await self._encoded_metadata(meta, encoding)
+        response = await self._send(headers, encoded or meta, offload=encoded is None)
+        if meta.encodings:
+            response.headers["vary"] = "Accept-Encoding"
+        if encoded is not None and response.status_code != 304:
+            response.headers["content-encoding"] = encoding
+        return response
+
+    async def _send(self, headers: Headers, meta: FileMeta, offload: bool = True):
+        if (response := not_modified(headers, meta)) is not None:
+            return response
+        # локальная копия объекта удалённого хранилища могла быть вытеснена из дискового кэша
+        if meta.key is not None and await get_storage().local_path(meta.key) is None:
+            raise ResultNotFound
+        # X-Accel-Redirect не передаёт Content-Encoding, сжатые копии отдаёт приложение
+        if offload and (response := offload_response(headers, meta, self.client)) is not None:
+            return response
+        return file_response(headers, meta, await download_cache.get(meta))
+
+    async def deactivate(self, hashed):
         self.hashed = hashed
-        file = await self.uow.repositories.file.find_one(hash=self.hashed, is_active=True)
-        return FileResponse(self._generate_path())
-
-    async def _map_file_data(self, data):
-        self.hashed = data.hash
-        return DataFile(
-            id = data.id,
-            name = data.name,
-            hash=data.hash,
-            create_date=data.create_date,
-            url=await self._generate_url()
-        )
-
-    async def get_my_files(self):
-        files = await self.uow.repositories.file.find_filtered(user_id=self.user_id, is_active=True)
-        return JSONResponse(
-            AllFilesOutput(
-                items = [
-                    await self._map_file_data(file) for file in files
-                ]
-            ).model_dump(mode='json'))
+        file = await self.uow.repositories.file.find_latest(hash=self.hashed, type=self.TYPE_NAME,
+                                                            user_id=self.user_id, is_active=True)
+        await self.uow.repositories.file.edit_one(file.id, {"is_active": False})
+        if file.blob_id is not None:
+            await self.uow.repositories.blob.release(file.blob_id)
+        await quota.release(self.uow, self.user_id, self.TYPE_NAME, file.size or 0)
+        await self.uow.commit()
+        await invalidate_file(self.TYPE_NAME, self.hashed)
+        return SuccessResponse()
+
+    def _url_prefix(self):
+        return settings.file_server_url + "files/" + self.TYPE_NAME + "/"
+
+    async def get_my_files(self, cursor: str = None, limit: int = None):
+        limit = min(limit or settings.listing_page_size, settings.listing_max_page_size)
+        # берём на одну строку больше, чтобы понять, есть ли следующая страница
+        files = await self.uow.repositories.file.find_page(self.user_id, self.TYPE_NAME, decode_cursor(cursor),
+                                                           limit + 1)
+        next_cursor = encode_cursor(files[limit - 1].create_date, files[limit - 1].id) if len(files) > limit else None
+        return Response(files_page_json(files[:limit], self.TYPE_NAME, self._url_prefix(), next_cursor),
+                        media_type="application/json")
+
+    async def _iter_all_files(self) -> AsyncIterator[bytes]:
+        after = None
+        while True:
+            # каждая страница читается в своей короткой сессии: пока клиент медленно принимает поток,
+            # соединение из пула свободно
+            async with self.uow:
+                files = await self.uow.repositories.file.find_page(self.user_id, self.TYPE_NAME, after,
+                                                                   settings.listing_max_page_size)
+            if not files:
+                return
+            yield files_ndjson(files, self.TYPE_NAME, self._url_prefix())
+            after = (files[-1].create_date, files[-1].id)
+
+    async def stream_my_files(self):
+        """
+        Все файлы пользователя в NDJSON, страница за страницей, без накопления в памяти
+        """
+        return StreamingResponse(self._iter_all_files(), media_type="application/x-ndjson")
+
+    @staticmethod
+    def _archive_name(row, used: set[str]) -> str:
+        # в архиве нет каталогов; одинаковые имена различаются номером в порядке загрузки
+        name = row.name.replace("/", "_").replace("\\", "_").strip(" .") or row.hash
+        candidate, number = name, 1
+        while candidate in used:
+            candidate = f"{Path(name).stem} ({number}){Path(name).suffix}"
+            number += 1
+        used.add(candidate)
+        return candidate
+
+    async def _export_entry(self, row, used: set[str]):
+        source = row.path if row.blob_id is not None else await self._generate_path(row.hash, row.path)
+        return ZipEntry(name=self._archive_name(row, used), size=row.size, crc32=row.crc32,
+                        modified=row.create_date, source=source, is_blob=row.blob_id is not None)
+
+    async def _export_entries(self) -> list[ZipEntry]:
+        entries, used, after_id, pending = [], set(), 0, 0
+        while rows := await self.uow.repositories.file.find_export_page(self.user_id, self.TYPE_NAME, after_id,
+                                                                        settings.listing_max_page_size):
+            for row in rows:
+                if row.crc32 is None or row.size is None:
+                    pending += 1
+                elif not pending:
+                    entries.append(await self._export_entry(row, used))
+            after_id = rows[-1].id
+        if pending:
+            # CRC32 ещё не заполнен сверкой хранилища: содержимое в запросе не хэшируем,
+            # а неполный архив клиент принял бы за весь экспорт
+            raise HTTPException(503, f"Экспорт ещё не готов: файлов без контрольной суммы — {pending}",
+                                headers={"Retry-After": str(settings.reconcile_interval)})
+        return entries
+
+    @staticmethod
+    async def _resolve_entry(entry: ZipEntry):
+        return await get_storage().local_path(entry.source) if entry.is_blob else entry.source
+
+    async def export_my_files(self, headers: Headers = None):
+        """
+        Все файлы пользователя одним ZIP без сжатия (медиа уже сжаты). Раскладка архива
+        вычисляется из метаданных, содержимое читается потоком, память не зависит от размера файлов.
+        Порядок записей — по id, поэтому повторный запрос с Range продолжает тот же архив.
+        Пока у части файлов нет CRC32, отвечает 503 с Retry-After, а не архивом без этих файлов.
+        """
+        async with self.uow:
+            layout = ZipLayout(await self._export_entries())
+        return archive_response(headers or Headers(), layout, f"{self.TYPE_NAME}.zip", self._resolve_entry)
 
 
 class PhotoFileResponseService(ResponseFile):
     TYPE_NAME = "photos"
 
+    async def get_variant(self, hashed, width: int = None, fmt: str = None, headers: Headers = None,
+                          query: QueryParams = None, client: str = None):
+        """
+        Уменьшенная и/или перекодированная копия фото. Создаётся при первом запросе
+        в пуле процессов и дальше отдаётся из дискового кэша вариантов.
+        """
+        self.client = client
+        meta = await self._active_metadata(hashed, query)
+        if not images.available():
+            raise HTTPException(501, "Обработка изображений недоступна")
+        width = images.variant_width(width)
+        fmt = images.variant_format(self.hashed, fmt)
+        name = f"{meta.digest or self.hashed}-{width or 'original'}.{fmt}"
+
+        async def render(destination: str) -> bool:
+            # копия оригинала из удалённого хранилища могла быть вытеснена из кэша
+            source = await get_storage().local_path(meta.key) if meta.key is not None else meta.path
+            return source is not None and await images.render_variant(source, destination, width, fmt)
+
+        path = await images.variant_cache.get(sharded_key(self.TYPE_NAME, name), render)
+        if path is None:
+            raise ResultNotFound
+        stat_result = await run_in_threadpool(os.stat, path)
+        variant = FileMeta(path=path, type=self.TYPE_NAME, is_active=True, size=stat_result.st_size,
+                           mtime=meta.mtime, media_type=images.VARIANT_FORMATS[fmt], digest=name,
+                           immutable=meta.immutable)
+        return await self._respond(headers or Headers(), variant)
+
 class AudioFileResponseService(ResponseFile):
     TYPE_NAME = "audios"
 
@@ -170,4 +644,6 @@ class DocumentFileResponseService(ResponseFile):
     TYPE_NAME = "documents"
 
 class APKFileResponseService(ResponseFile):
-    TYPE_NAME = "mobiles"
\ No newline at end of file
+    TYPE_NAME = "mobiles"
+    # APK загружается заново под тем же именем файла
+    IMMUTABLE_KEYS = False
\ No newline at end of file
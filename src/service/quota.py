@@ -0,0 +1,58 @@
+import asyncio
+
+from src.adapters.database.locks import run_exclusively
+from src.settings import settings
+from src.unit_of_work import UnitOfWork
+from src.utils.exceptions import QuotaExceeded
+
+# ключ advisory-блокировки пересчёта, общий для всех воркеров
+RECOMPUTE_LOCK = 7_242_025
+
+
+async def check(uow: UnitOfWork, user_id: int, size: int) -> None:
+    """
+    Проверка до записи содержимого: одно чтение общего счётчика пользователя, без блокировки.
+    Окончательно квоту соблюдает charge перед commit.
+    """
+    quota = settings.user_quota_bytes
+    if not quota:
+        return
+    used = await uow.repositories.usage.find_total(user_id)
+    # транзакция чтения закрывается сразу: хэширование и запись идут без занятого соединения
+    await uow.rollback()
+    if used + size > quota:
+        raise QuotaExceeded
+
+
+async def charge(uow: UnitOfWork, user_id: int, type: str, size: int, files: int = 1) -> None:
+    """
+    Учитывает загруженные файлы в счётчиках; вызывается до переноса содержимого в хранилище,
+    чтобы отказ откатил транзакцию, пока исходные файлы ещё на месте
+    """
+    if not await uow.repositories.usage.add(user_id, type, size, files, settings.user_quota_bytes):
+        raise QuotaExceeded
+
+
+async def release(uow: UnitOfWork, user_id: int, type: str, size: int, files: int = 1) -> None:
+    await uow.repositories.usage.add(user_id, type, -size, -files)
+
+
+async def recompute_usage() -> None:
+    """
+    Пересчёт счётчиков по таблице files пачками пользователей: исправляет расхождения
+    после сбоев и учитывает файлы, загруженные до появления счётчиков.
+    Задача запущена в каждом воркере, пересчёт выполняет один.
+    """
+    await run_exclusively(RECOMPUTE_LOCK, _recompute_usage)
+
+
+async def _recompute_usage() -> None:
+    last_id = 0
+    uow = UnitOfWork()
+    async with uow:
+        while user_ids := await uow.repositories.usage.find_user_ids_after(last_id,
+                                                                            settings.usage_recompute_batch_size):
+            last_id = user_ids[-1]
+            await uow.repositories.usage.recompute(user_ids)
+            await uow.commit()
+            await asyncio.sleep(settings.reconcile_pause)
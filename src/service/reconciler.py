@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterator
+
+from starlette.concurrency import run_in_threadpool
+
+from src.adapters.database.locks import run_exclusively
+from src.adapters.storage.backends import get_storage
+from src.adapters.storage.blobs import blob_store
+from src.service import quota
+from src.service.file import invalidate_file
+from src.settings import settings
+from src.unit_of_work import UnitOfWork
+from src.utils.layout import legacy_path
+from src.utils.streaming import discard, digest_file
+
+
+# ключ advisory-блокировки сверки, общий для всех воркеров
+RECONCILE_LOCK = 7_242_020
+
+
+def _walk(directory: str) -> Iterator[str]:
+    for dirpath, _, names in os.walk(directory):
+        for name in names:
+            yield os.path.join(dirpath, name)
+
+
+def _next_batch(files: Iterator[str], size: int) -> list[tuple[str, float]]:
+    batch = []
+    for path in islice(files, size):
+        try:
+            batch.append((path, os.stat(path).st_mtime))
+        except FileNotFoundError:
+            pass
+    return batch
+
+
+def _legacy_missing(files: list[tuple[int, str, str, str]]) -> list[int]:
+    return [id for id, type, hash, path in files if not os.path.exists(legacy_path(type, hash, path))]
+
+
+def _discard_many(paths: list[str]) -> None:
+    for path in paths:
+        discard(path)
+
+
+class StorageReconciler:
+    """
+    Сверяет хранилище с таблицами blobs и files пачками по RECONCILE_BATCH_SIZE,
+    делая паузу RECONCILE_PAUSE между пачками, чтобы не мешать вводу-выводу запросов:
+
+    - удаляет временные файлы брошенных загрузок и файлы blobs/ без строки в БД;
+    - отключает файлы, содержимого которых нет в хранилище;
+    - удаляет blob без ссылок вместе с содержимым;
+    - дописывает CRC32 для blob, загруженных до его появления (нужен для экспорта в ZIP).
+
+    Всё, что моложе ORPHAN_GRACE_PERIOD, не трогается: это может быть загрузка,
+    которая ещё не успела закоммитить.
+    """
+
+    def __init__(self):
+        self.batch_size = settings.reconcile_batch_size
+        self.pause = settings.reconcile_pause
+        self.grace = settings.orphan_grace_period
+
+    async def _throttle(self):
+        await asyncio.sleep(self.pause)
+
+    async def remove_stale_staging(self):
+        cutoff = time.time() - self.grace
+        files = _walk(blob_store.staging)
+        while batch := await run_in_threadpool(_next_batch, files, self.batch_size):
+            await run_in_threadpool(_discard_many, [path for path, mtime in batch if mtime < cutoff])
+            await self._throttle()
+
+    async def remove_orphan_blobs(self):
+        cutoff = time.time() - self.grace
+        storage = get_storage()
+        uow = UnitOfWork()
+        async with uow:
+            async for batch in storage.iter_batches(blob_store.PREFIX, self.batch_size):
+                old = [key for key, mtime in batch if mtime < cutoff]
+                # сжатая копия принадлежит blob, ключ которого получается отбрасыванием суффикса
+                bases = {key: blob_store.base_key(key) for key in old}
+                known = await uow.repositories.blob.find_existing_paths(list(set(bases.values()))) if old else set()
+                # соединение возвращается в пул на время удаления, паузы и обхода следующей пачки
+                await uow.rollback()
+                await storage.delete_many([key for key in old if bases[key] not in known])
+                await self._throttle()
+
+    async def _deactivate(self, uow: UnitOfWork, **filter_by):
+        released = defaultdict(lambda: [0, 0])
+        for file in await uow.repositories.file.deactivate_many(**filter_by):
+            await invalidate_file(file.type, file.hash)
+            released[file.user_id, file.type][0] += file.size or 0
+            released[file.user_id, file.type][1] += 1
+        # пользователи в порядке id, как и при пересчёте счётчиков
+        for (user_id, type), (size, files) in sorted(released.items()):
+            await quota.release(uow, user_id, type, size, files)
+
+    async def deactivate_missing_blobs(self):
+        last_id = 0
+        storage = get_storage()
+        uow = UnitOfWork()
+        while True:
+            async with uow:
+                blobs = [(blob.id, blob.path, blob.ref_count) for blob in
+                         await uow.repositories.blob.find_after(last_id, self.batch_size)]
+            if not blobs:
+                return
+            last_id = blobs[-1][0]
+            # запросы к хранилищу (HEAD на каждый blob в S3) выполняются без открытой транзакции
+            lost = [id for id, key, ref_count in blobs if ref_count > 0 and not await storage.exists(key)]
+            if lost:
+                async with uow:
+                    for id in lost:
+                        await self._deactivate(uow, blob_id=id)
+                    await uow.repositories.blob.edit_many([{"id": id, "ref_count": 0} for id in lost])
+                    await uow.commit()
+            await self._throttle()
+
+    async def deactivate_missing_legacy_files(self):
+        last_id = 0
+        uow = UnitOfWork()
+        async with uow:
+            while files := await uow.repositories.file.find_without_blob(last_id, self.batch_size):
+                last_id = files[-1].id
+                # rollback помечает строки устаревшими, поэтому поля копируются до него
+                active = [(file.id, file.type, file.hash, file.path) for file in files if file.is_active]
+                # файловая система проверяется без открытой транзакции
+                await uow.rollback()
+                lost = await run_in_threadpool(_legacy_missing, active)
+                if lost:
+                    # deactivate_many снимает только is_active=True: файл, отключённый за это время, не учтётся дважды
+                    await self._deactivate(uow, ids=lost)
+                    await uow.commit()
+                await self._throttle()
+
+    async def collect_unreferenced_blobs(self):
+        before = datetime.now() - timedelta(seconds=self.grace)
+        uow = UnitOfWork()
+        async with uow:
+            while blobs := await uow.repositories.blob.lock_unreferenced(before, self.batch_size):
+                ids = [blob.id for blob in blobs]
+                await uow.repositories.file.detach_blobs(ids)
+                await uow.repositories.blob.delete_many(ids)
+                # файл удаляется, пока строка заблокирована: acquire того же содержимого дождётся commit
+                # и запишет его заново
+                await get_storage().delete_many([key for blob in blobs for key in blob_store.keys(blob)])
+                await uow.commit()
+                await self._throttle()
+
+    async def backfill_crc32(self):
+        last_id = 0
+        storage = get_storage()
+        uow = UnitOfWork()
+        while True:
+            async with uow:
+                blobs = [(blob.id, blob.path) for blob in
+                         await uow.repositories.blob.find_without_crc32(last_id, self.batch_size)]
+            if not blobs:
+                return
+            last_id = blobs[-1][0]
+            # содержимое читается из хранилища без открытой транзакции, сессия нужна только для записи
+            values = []
+            for id, key in blobs:
+                digest = await storage.digest(key, settings.upload_chunk_size)
+                if digest is None:
+                    # пропажу содержимого обработает deactivate_missing_blobs
+                    continue
+                values.append({"id": id, "crc32": digest[2]})
+            if values:
+                async with uow:
+                    await uow.repositories.blob.edit_many(values)
+                    await uow.commit()
+            await self._throttle()
+
+    async def backfill_legacy_crc32(self):
+        """
+        Размер и CRC32 старых файлов без blob: ZIP-экспорт берёт их из БД и не читает содержимое в запросе
+        """
+        last_id = 0
+        uow = UnitOfWork()
+        async with uow:
+            while files := await uow.repositories.file.find_legacy_without_crc32(last_id, self.batch_size):
+                last_id = files[-1].id
+                values = []
+                for file in files:
+                    path = await run_in_threadpool(legacy_path, file.type, file.hash, file.path)
+                    try:
+                        _, size, crc32 = await digest_file(path, settings.upload_chunk_size)
+                    except FileNotFoundError:
+                        # пропажу файла обработает deactivate_missing_legacy_files
+                        continue
+                    values.append({"id": file.id, "size": size, "crc32": crc32})
+                await uow.repositories.file.edit_many(values)
+                await uow.commit()
+                await self._throttle()
+
+    async def run(self):
+        await self.remove_stale_staging()
+        await self.remove_orphan_blobs()
+        await self.deactivate_missing_blobs()
+        await self.deactivate_missing_legacy_files()
+        await self.collect_unreferenced_blobs()
+        await self.backfill_crc32()
+        await self.backfill_legacy_crc32()
+
+
+async def reconcile_storage() -> None:
+    # задача запущена в каждом воркере, сверку выполняет один
+    await run_exclusively(RECONCILE_LOCK, StorageReconciler().run)
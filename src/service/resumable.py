@@ -0,0 +1,211 @@
+import math
+import os
+import secrets
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+
+from src.adapters.database.locks import run_exclusively
+from src.adapters.storage.backends import get_storage
+from src.adapters.storage.blobs import blob_store
+from src.schemas.file import UploadSessionInput, UploadSessionOutput, UploadChunkOutput, FileUploadOutput
+from src.service import quota
+from src.service.file import FileUpload, VideoFileUploadService, APKFileUploadService, invalidate_file
+from src.settings import settings
+from src.unit_of_work import UnitOfWork
+from src.utils.Authorization import Authorization
+from src.utils.exceptions import FileSizeExceeded, ResultNotFound
+from src.utils.signing import file_url
+from src.utils.streaming import allocate, stage_stream, write_at_offset, digest_file, discard
+
+# ключ advisory-блокировки очистки сессий, общий для всех воркеров
+CLEANUP_LOCK = 7_242_004
+
+RESUMABLE_SERVICES: dict[str, type[FileUpload]] = {
+    VideoFileUploadService.TYPE_NAME: VideoFileUploadService,
+    APKFileUploadService.TYPE_NAME: APKFileUploadService,
+}
+
+
+def _part_path(session_token: str) -> str:
+    return os.path.join(settings.file_storage, "uploads", session_token + ".part")
+
+
+class ResumableUpload(Authorization):
+    """
+    Возобновляемая загрузка: создание сессии -> загрузка частей (в любом порядке и параллельно) -> завершение.
+    Части пишутся сразу по своим смещениям в заранее выделенный .part файл,
+    поэтому при завершении файл не собирается заново, а только переносится на место.
+    """
+
+    def __init__(self, uow: UnitOfWork, token: HTTPAuthorizationCredentials, **kwargs):
+        super().__init__(token, **kwargs)
+        self.uow = uow
+
+    @staticmethod
+    def _chunks(session) -> int:
+        return math.ceil(session.size / session.chunk_size)
+
+    async def _active_session(self, session_token: str, lock: bool = False, read: bool = False):
+        if lock:
+            session = await self.uow.repositories.upload_session.lock_active(session_token, read=read)
+        else:
+            session = await self.uow.repositories.upload_session.find_one(token=session_token, is_active=True)
+        if session.user_id != self.user_id or session.expires_at < datetime.now():
+            raise ResultNotFound
+        return session
+
+    def _session_output(self, session, received: list[int] = None):
+        return UploadSessionOutput(
+            session=session.token,
+            chunk_size=session.chunk_size,
+            chunks=self._chunks(session),
+            expires_at=session.expires_at,
+            received=received or [],
+        )
+
+    async def create(self, service: type[FileUpload], data: UploadSessionInput):
+        if Path(data.name).suffix not in service.AVAILABLE_EXTENSIONS:
+            raise HTTPException(403, f"Extension error. Available: {service.AVAILABLE_EXTENSIONS}")
+        if data.size >= service.MAX_FILE_SIZE * 1024 * 1024:
+            raise FileSizeExceeded
+        await quota.check(self.uow, self.user_id, data.size)
+
+        session_token = secrets.token_urlsafe(24)
+        await run_in_threadpool(allocate, _part_path(session_token), data.size)
+        session = await self.uow.repositories.upload_session.add_one(
+            {
+                "token": session_token,
+                "user_id": self.user_id,
+                "name": data.name,
+                "type": service.TYPE_NAME,
+                "size": data.size,
+                "chunk_size": settings.resumable_chunk_size,
+                "expires_at": datetime.now() + timedelta(seconds=settings.resumable_session_ttl),
+            }
+        )
+        await self.uow.commit()
+        return self._session_output(session)
+
+    async def status(self, session_token: str):
+        session = await self._active_session(session_token)
+        chunks = await self.uow.repositories.upload_chunk.find_filtered(session_id=session.id)
+        return self._session_output(session, sorted(chunk.index for chunk in chunks))
+
+    async def put_chunk(self, session_token: str, index: int, checksum: str, stream: AsyncIterator[bytes]):
+        session = await self._active_session(session_token)
+        if not 0 <= index < self._chunks(session):
+            raise HTTPException(400, "Неверный номер части")
+
+        offset = index * session.chunk_size
+        expected = min(session.chunk_size, session.size - offset)
+        # соединение не держится, пока принимается тело части
+        await self.uow.rollback()
+        # часть сначала пишется отдельно: уже принятые байты в .part не затираются непроверенными
+        result = await stage_stream(stream, blob_store.staging, expected, settings.upload_chunk_size)
+        try:
+            if result.size != expected:
+                raise HTTPException(400, f"Неверный размер части. Ожидается: {expected}")
+            if not secrets.compare_digest(result.digest, checksum.lower()):
+                raise HTTPException(400, "Контрольная сумма части не совпадает")
+
+            # части одной сессии пишутся параллельно, но не во время finalize
+            session = await self._active_session(session_token, lock=True, read=True)
+            await write_at_offset(result.path, _part_path(session.token), offset, settings.upload_chunk_size)
+            await self.uow.repositories.upload_chunk.upsert(
+                {
+                    "session_id": session.id,
+                    "index": index,
+                    "offset": offset,
+                    "size": result.size,
+                    "checksum": result.digest,
+                }
+            )
+            await self.uow.commit()
+        finally:
+            await run_in_threadpool(discard, result.path)
+        return UploadChunkOutput(index=index, offset=offset, size=result.size)
+
+    async def _chunk_checksums(self, session) -> list[tuple[int, str]]:
+        chunks = await self.uow.repositories.upload_chunk.find_filtered(session_id=session.id)
+        return sorted((chunk.index, chunk.checksum) for chunk in chunks)
+
+    @staticmethod
+    async def _upload_ahead(part_path: str, digest: str) -> bool:
+        # как FileUpload._save_ahead: передача в удалённое хранилище без транзакции, .part остаётся на месте
+        storage = get_storage()
+        if not storage.remote or await storage.exists(blob_store.key(digest)):
+            return False
+        await storage.put(blob_store.key(digest), part_path, keep=True)
+        return True
+
+    async def finalize(self, session_token: str):
+        session = await self._active_session(session_token)
+        checksums = await self._chunk_checksums(session)
+        if len(checksums) != self._chunks(session):
+            raise HTTPException(409, "Загружены не все части")
+        # rollback помечает строку сессии устаревшей: поля нужны до него
+        service = RESUMABLE_SERVICES[session.type]
+        name = session.name
+        part_path = _part_path(session.token)
+        # хэширование и передача в хранилище идут без занятого соединения
+        await self.uow.rollback()
+
+        key = await service._hash_name(name, Path(name).suffix)
+        try:
+            digest, size, crc32 = await digest_file(part_path, settings.upload_chunk_size)
+        except FileNotFoundError:
+            # сессию уже завершил параллельный запрос
+            raise ResultNotFound
+        uploaded = await self._upload_ahead(part_path, digest)
+
+        # второй параллельный finalize дождётся commit первого и не найдёт активной сессии
+        session = await self._active_session(session_token, lock=True)
+        if await self._chunk_checksums(session) != checksums:
+            raise HTTPException(409, "Части изменились во время завершения загрузки")
+        blob = await self.uow.repositories.blob.acquire(digest, blob_store.key(digest), size, crc32)
+        await self.uow.repositories.file.add_one(
+            {
+                "name": session.name,
+                "hash": key,
+                "path": blob.path,
+                "type": service.TYPE_NAME,
+                "user_id": self.user_id,
+                "blob_id": blob.id,
+                "size": size
+            }
+        )
+        await self.uow.repositories.upload_session.edit_one(session.id, {"is_active": False})
+        await self.uow.repositories.upload_chunk.delete_for_sessions([session.id])
+        # квота до переноса: при отказе .part остаётся и сессию можно завершить позже
+        await quota.charge(self.uow, self.user_id, service.TYPE_NAME, size)
+        # файл переносится на место последним перед commit, как и в FileUpload.upload
+        if blob.ref_count == 1 and not uploaded:
+            await get_storage().put(blob.path, part_path)
+        await self.uow.commit()
+        await run_in_threadpool(discard, part_path)
+        await invalidate_file(service.TYPE_NAME, key)
+        return FileUploadOutput(url=file_url(service.TYPE_NAME, key, digest))
+
+
+async def cleanup_expired_upload_sessions(batch_size: int = 100) -> None:
+    """
+    Удаляет .part файлы и части брошенных сессий, срок действия которых истёк.
+    Задача запущена в каждом воркере, очистку выполняет один.
+    """
+    await run_exclusively(CLEANUP_LOCK, lambda: _cleanup_expired_upload_sessions(batch_size))
+
+
+async def _cleanup_expired_upload_sessions(batch_size: int) -> None:
+    uow = UnitOfWork()
+    async with uow:
+        while sessions := await uow.repositories.upload_session.find_expired(datetime.now(), batch_size):
+            for session in sessions:
+                await run_in_threadpool(discard, _part_path(session.token))
+                await uow.repositories.upload_session.edit_one(session.id, {"is_active": False})
+            await uow.repositories.upload_chunk.delete_for_sessions([session.id for session in sessions])
+            await uow.commit()
@@ -1,6 +1,10 @@
+import ipaddress
+import os
 from functools import cached_property
+from typing import Literal, Optional
 
 from cachetools import cached
+from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,10 +20,143 @@ class Settings(BaseSettings):
     FILE_SERVER_URL: str
     MEMCACHE_SERVER: str
 
+    # Поля ниже читаются из переменных окружения с тем же именем в верхнем регистре (UPLOAD_CHUNK_SIZE и т. д.)
+    database_replica_url: Optional[str] = None
+    storage_key_scheme: Literal["random", "pbkdf2"] = "random"
+    storage_key_workers: int = 2
+    upload_chunk_size: int = 1024 * 1024
+    upload_batch_max_files: int = 50
+    # общий размер тела пакетной загрузки в мегабайтах; крупные файлы загружаются по одному
+    upload_batch_max_size: int = 100
+    upload_batch_concurrency: int = 4
+    resumable_chunk_size: int = 8 * 1024 * 1024
+    resumable_session_ttl: int = 24 * 60 * 60
+    resumable_cleanup_interval: int = 10 * 60
+    reconcile_interval: int = 60 * 60
+    reconcile_batch_size: int = 500
+    reconcile_pause: float = 0.2
+    orphan_grace_period: int = 60 * 60
+    # 0 — без ограничения
+    user_quota_bytes: int = 0
+    usage_recompute_interval: int = 6 * 60 * 60
+    usage_recompute_batch_size: int = 500
+    storage_fanout_depth: int = 2
+    storage_fanout_width: int = 2
+    metadata_cache_size: int = 100_000
+    metadata_cache_ttl: int = 5 * 60
+    metadata_negative_ttl: int = 5
+    download_cache_bytes: int = 256 * 1024 * 1024
+    download_cache_max_file: int = 1024 * 1024
+    download_offload: Literal["none", "auto", "x-accel-redirect", "x-sendfile"] = "none"
+    download_offload_prefix: str = "/protected/"
+    listing_page_size: int = 100
+    listing_max_page_size: int = 1000
+    jwt_cache_size: int = 10_000
+    # роль в JWT, с которой доступна статистика /stats
+    stats_role: str = "admin"
+    # подписанные ссылки ускоряют отдачу (без БД и кэша метаданных), но не закрывают доступ по неподписанным:
+    # ключ файла и так неугадываем. Удалённый файл отдаётся по подписанной ссылке до её истечения
+    signed_urls: bool = False
+    signed_url_ttl: int = 60 * 60
+    memcache_pool_size: int = 10
+    memcache_timeout: float = 0.5
+    memcache_failure_threshold: int = 5
+    memcache_retry_after: float = 10
+    image_optimize: bool = True
+    image_workers: int = 2
+    image_quality: int = 85
+    # по умолчанию <FILE_STORAGE>/variants
+    image_variant_dir: Optional[str] = None
+    image_variant_cache_bytes: int = 2 * 1024 * 1024 * 1024
+    precompress_min_size: int = 1024
+    precompress_max_ratio: float = 0.9
+    precompress_workers: int = 2
+    storage_backend: Literal["local", "s3"] = "local"
+    # по умолчанию <FILE_STORAGE>/cache
+    storage_cache_dir: Optional[str] = None
+    storage_cache_bytes: int = 10 * 1024 * 1024 * 1024
+    s3_bucket: Optional[str] = None
+    s3_endpoint_url: Optional[str] = None
+    s3_region: Optional[str] = None
+    s3_access_key: Optional[str] = None
+    s3_secret_key: Optional[str] = None
+    s3_multipart_chunk_size: int = 8 * 1024 * 1024
+    s3_max_concurrency: int = 4
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 30 * 60
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    db_command_timeout: float = 30
+
+    # Списки через запятую: разбираются свойствами ниже
+    IMAGE_VARIANT_WIDTHS: str = "64,128,256,512,1024,2048"
+    PRECOMPRESS_ENCODINGS: str = "br,zstd,gzip"
+    # умеренные уровни: сжатие идёт при каждой загрузке нового содержимого, до ответа клиенту;
+    # brotli 11 и zstd 19 медленнее в десятки раз при выигрыше в несколько процентов
+    PRECOMPRESS_LEVELS: str = "br=5,zstd=9,gzip=6"
+    # дополнительные каталоги для X-Accel-Redirect: "каталог=префикс" через запятую,
+    # например STORAGE_CACHE_DIR и IMAGE_VARIANT_DIR вне FILE_STORAGE
+    DOWNLOAD_OFFLOAD_LOCATIONS: str = ""
+    # адреса и подсети прокси через запятую, которым в режиме auto доверяется заголовок X-Sendfile-Type
+    DOWNLOAD_OFFLOAD_TRUSTED_PROXIES: str = "127.0.0.1,::1"
+
+    @field_validator("storage_key_scheme", "download_offload", "storage_backend", mode="before")
+    @classmethod
+    def _lower(cls, value):
+        return value.lower() if isinstance(value, str) else value
+
+    @model_validator(mode="after")
+    def _storage_dirs(self):
+        self.image_variant_dir = self.image_variant_dir or self.FILE_STORAGE.rstrip("/") + "/variants"
+        self.storage_cache_dir = self.storage_cache_dir or self.FILE_STORAGE.rstrip("/") + "/cache"
+        return self
+
     @cached_property
     def postgres_url(self):
         return self.DATABASE_URL
 
+    @cached_property
+    def image_variant_widths(self):
+        return sorted(int(width) for width in self.IMAGE_VARIANT_WIDTHS.split(",") if width.strip())
+
+    @cached_property
+    def precompress_encodings(self):
+        return [encoding.strip().lower() for encoding in self.PRECOMPRESS_ENCODINGS.split(",") if encoding.strip()]
+
+    @cached_property
+    def precompress_levels(self):
+        levels = {}
+        for item in self.PRECOMPRESS_LEVELS.split(","):
+            encoding, _, level = item.partition("=")
+            if encoding.strip() and level.strip():
+                levels[encoding.strip().lower()] = int(level)
+        return levels
+
+    @property
+    def s3_options(self):
+        return {
+            "endpoint_url": self.s3_endpoint_url,
+            "region_name": self.s3_region,
+            "aws_access_key_id": self.s3_access_key,
+            "aws_secret_access_key": self.s3_secret_key,
+        }
+
+    @property
+    def engine_options(self):
+        return {
+            "pool_size": self.db_pool_size,
+            "max_overflow": self.db_max_overflow,
+            "pool_timeout": self.db_pool_timeout,
+            "pool_recycle": self.db_pool_recycle,
+            "pool_pre_ping": self.db_pool_pre_ping,
+            "connect_args": {
+                "prepared_statement_cache_size": self.db_statement_cache_size,
+                "command_timeout": self.db_command_timeout,
+            },
+        }
+
 
     @cached_property
     def app_host(self):
@@ -46,8 +183,28 @@ class Settings(BaseSettings):
     def memcache_server(self):
         return self.MEMCACHE_SERVER
 
+    @cached_property
+    def memcache_servers(self):
+        return [server.strip() for server in self.MEMCACHE_SERVER.split(",") if server.strip()]
+
     @cached_property
     def file_server_url(self):
         return self.FILE_SERVER_URL
 
+    @cached_property
+    def download_offload_trusted_proxies(self):
+        return [ipaddress.ip_network(item.strip(), strict=False)
+                for item in self.DOWNLOAD_OFFLOAD_TRUSTED_PROXIES.split(",") if item.strip()]
+
+    @cached_property
+    def download_offload_locations(self):
+        locations = [(self.FILE_STORAGE, self.download_offload_prefix)]
+        for item in self.DOWNLOAD_OFFLOAD_LOCATIONS.split(","):
+            root, _, prefix = item.partition("=")
+            if root.strip() and prefix.strip():
+                locations.append((root.strip(), prefix.strip()))
+        # вложенный каталог проверяется раньше объемлющего
+        locations = [(os.path.abspath(root), prefix) for root, prefix in locations]
+        return sorted(locations, key=lambda location: len(location[0]), reverse=True)
+
 settings = Settings()
@@ -0,0 +1,56 @@
+"""
+Сериализация страницы списка файлов: прежний путь (DataFile + AllFilesOutput + JSONResponse)
+против files_page_json на orjson. Строки выборки генерируются, БД не участвует.
+
+    python -m src.tools.bench.listing --rows 1000 --repeat 200
+"""
+import argparse
+import timeit
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from starlette.responses import JSONResponse, Response
+
+from src.schemas.file import AllFilesOutput, DataFile
+from src.utils.serialization import files_page_json
+
+Row = namedtuple("Row", "id name hash create_date digest")
+TYPE_NAME = "documents"
+URL_PREFIX = "https://files.example.com/files/documents/"
+
+
+def _rows(count: int) -> list[Row]:
+    start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    return [Row(id, f"document {id}.pdf", f"{id:044x}.pdf", start - timedelta(seconds=id), None)
+            for id in range(count, 0, -1)]
+
+
+def pydantic_page(rows: list[Row], next_cursor: str) -> bytes:
+    return JSONResponse(
+        AllFilesOutput(
+            items=[DataFile(id=row.id, name=row.name, hash=row.hash, create_date=row.create_date,
+                            url=URL_PREFIX + row.hash) for row in rows],
+            next_cursor=next_cursor,
+        ).model_dump(mode="json")
+    ).body
+
+
+def orjson_page(rows: list[Row], next_cursor: str) -> bytes:
+    return Response(files_page_json(rows, TYPE_NAME, URL_PREFIX, next_cursor), media_type="application/json").body
+
+
+def main(count: int, repeat: int) -> None:
+    rows = _rows(count)
+    print(f"rows={count} repeat={repeat}")
+    for name, serialize in (("pydantic", pydantic_page), ("orjson", orjson_page)):
+        best = min(timeit.repeat(lambda: serialize(rows, "cursor"), number=1, repeat=repeat))
+        size = len(serialize(rows, "cursor"))
+        print(f"{name:>8}: {best * 1000:8.2f} ms per page, {size} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark file listing serialization")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,71 @@
+"""
+Пропускная способность одного воркера на CPU-части загрузки: ключ файла + sha256/CRC32 содержимого.
+БД и запись в хранилище не участвуют, сравниваются только схемы ключей.
+
+    python -m src.tools.bench.upload_keys --uploads 2000 --concurrency 64 --size 65536
+
+Схемы: pbkdf2 (старая, PBKDF2 в пуле из STORAGE_KEY_WORKERS потоков), random (по умолчанию)
+и digest — только sha256 содержимого, нижняя граница стоимости загрузки.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from starlette.datastructures import UploadFile
+
+from src.settings import settings
+from src.utils.storage_keys import PBKDF2KeyGenerator, RandomKeyGenerator
+from src.utils.streaming import digest_upload
+
+
+def _body(size: int) -> UploadFile:
+    # как у Starlette: тело загрузки в SpooledTemporaryFile
+    buffer = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    buffer.write(os.urandom(size))
+    buffer.seek(0)
+    return UploadFile(buffer, size=size, filename="photo.jpg")
+
+
+async def _run(scheme: str, uploads: int, concurrency: int, size: int) -> float:
+    generator = {
+        "pbkdf2": lambda: PBKDF2KeyGenerator(settings.storage_key_workers),
+        "random": RandomKeyGenerator,
+        "digest": lambda: None,
+    }[scheme]()
+    bodies = [_body(size) for _ in range(concurrency)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(index: int):
+        async with semaphore:
+            body = bodies[index % concurrency]
+            await body.seek(0)
+            if generator is not None:
+                await generator.generate(body.filename, ".jpg")
+            await digest_upload(body, settings.upload_chunk_size)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(index) for index in range(uploads)))
+    elapsed = time.perf_counter() - started
+    if isinstance(generator, PBKDF2KeyGenerator):
+        generator.executor.shutdown()
+    return uploads / elapsed
+
+
+async def main(schemes: list[str], uploads: int, concurrency: int, size: int) -> None:
+    print(f"uploads={uploads} concurrency={concurrency} size={size} key_workers={settings.storage_key_workers}")
+    for scheme in schemes:
+        rate = await _run(scheme, uploads, concurrency, size)
+        print(f"{scheme:>8}: {rate:10.1f} uploads/s per worker")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark storage key schemes on the upload path")
+    parser.add_argument("--schemes", nargs="+", default=["pbkdf2", "random", "digest"],
+                        choices=["pbkdf2", "random", "digest"])
+    parser.add_argument("--uploads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.schemes, args.uploads, args.concurrency, args.size))
@@ -0,0 +1,60 @@
+"""
+Перенос файлов без blob из плоских каталогов <type>/<hash> в разбитую раскладку <type>/ab/cd/<hash>.
+
+    python -m src.tools.migrate_layout --batch-size 500 --workers 8
+
+Можно запускать на работающем сервисе: пока файл не перенесён, скачивание берёт его
+из плоского каталога. Повторный запуск продолжает с уже перенесённого состояния.
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from src.settings import settings
+from src.unit_of_work import UnitOfWork
+from src.utils.layout import sharded_key, flat_key
+
+
+def _relocate(type_name: str, name: str, stored: str) -> str:
+    if os.path.basename(stored) == name:
+        # уже перенесён: путь остаётся прежним, даже если с тех пор изменились настройки fanout
+        return stored
+    key = sharded_key(type_name, name)
+    source = os.path.join(settings.file_storage, flat_key(type_name, name))
+    destination = os.path.join(settings.file_storage, key)
+    if os.path.exists(source):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(source, destination)
+    return key
+
+
+async def migrate(batch_size: int, workers: int) -> None:
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migrate-layout")
+    last_id = 0
+    moved = 0
+
+    uow = UnitOfWork()
+    async with uow:
+        while files := await uow.repositories.file.find_without_blob(last_id, batch_size):
+            keys = await asyncio.gather(
+                *(loop.run_in_executor(executor, _relocate, file.type, file.hash, file.path) for file in files)
+            )
+            for file, key in zip(files, keys):
+                if file.path != key:
+                    await uow.repositories.file.edit_one(file.id, {"path": key})
+            await uow.commit()
+            last_id = files[-1].id
+            moved += len(files)
+            print(f"migrated {moved} files, last id {last_id}")
+
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move legacy files into the sharded storage layout")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.workers))
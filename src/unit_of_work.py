@@ -1,34 +1,70 @@
+import time
+
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from src.adapters.database.models.base import Base
 from src.adapters.database.repository_gateway import RepositoriesGateway
-from src.adapters.database.session import async_session_maker, engine
+from src.migrations import upgrade_head
+from src.adapters.database.session import async_session_maker, async_replica_session_maker
+from src.utils.metrics import connection_hold_time
 from src.utils.repositories_gateway import RepositoriesGatewayProtocol
 from src.utils.unit_of_work import UnitOfWorkProtocol
 
 
 class UnitOfWork(UnitOfWorkProtocol):
-    repositories: RepositoriesGatewayProtocol
+    """
+    Сессия создаётся при первом обращении к repositories, а не при входе в контекст:
+    запросы, обслуженные из кэша, не занимают соединение из пула
+    """
 
     def __init__(self):
         self.db_session_factory = async_session_maker
+        self.db_session: AsyncSession | None = None
+        self._repositories: RepositoriesGatewayProtocol | None = None
+        self._acquired_at = 0.0
 
-    async def __aenter__(self):
-        self.db_session = self.db_session_factory()
+    @property
+    def repositories(self) -> RepositoriesGatewayProtocol:
+        if self._repositories is None:
+            self.db_session = self.db_session_factory()
+            self._repositories = RepositoriesGateway(self.db_session)
+            self._acquired_at = time.perf_counter()
+        return self._repositories
 
-        self.repositories = RepositoriesGateway(self.db_session)
+    async def __aenter__(self):
+        return self
 
     async def __aexit__(self, *args):
-        await self.rollback()
-        await self.db_session.close()
+        if self.db_session is None:
+            return
+        try:
+            # close() сам откатывает незавершённую транзакцию при возврате соединения в пул
+            await self.db_session.close()
+        finally:
+            connection_hold_time.record(time.perf_counter() - self._acquired_at)
+            self.db_session = None
+            self._repositories = None
 
     async def commit(self):
-        await self.db_session.commit()
+        if self.db_session is not None:
+            await self.db_session.commit()
 
     async def rollback(self):
-        await self.db_session.rollback()
+        # после commit или для чистого чтения транзакции нет — лишний ROLLBACK не отправляем
+        if self.db_session is not None and self.db_session.in_transaction():
+            await self.db_session.rollback()
 
     async def init_db(self) -> None:
-        async with engine.begin() as connection:
-            #await connection.run_sync(Base.metadata.drop_all)
-            await connection.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        # create_all не добавляет колонки в существующие таблицы — схему ведут миграции alembic;
+        # env.py запускает свой цикл событий, поэтому upgrade выполняется в отдельном потоке
+        await run_in_threadpool(upgrade_head)
+
+
+class ReadOnlyUnitOfWork(UnitOfWork):
+    """
+    UnitOfWork для запросов только на чтение: сессии открываются на реплике
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.db_session_factory = async_replica_session_maker
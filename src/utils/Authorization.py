@@ -5,6 +5,7 @@ from fastapi.security import HTTPAuthorizationCredentials
 from jose import jwt
 
 from src.settings import settings
+from src.utils.token_cache import verified_tokens
 
 
 class Authorization:
@@ -21,10 +22,19 @@ class Authorization:
 
     def verify_jwt_token(self):
         token = self.token.credentials
+        key = verified_tokens.key(token)
+        decoded_token = verified_tokens.get(key)
+        if decoded_token is None:
+            decoded_token = self._decode_jwt_token(token)
+            verified_tokens.put(key, decoded_token)
+        self.token_roles = decoded_token['roles']
+        self.user_id = decoded_token['id']
+        return decoded_token
+
+    @staticmethod
+    def _decode_jwt_token(token: str):
         try:
             decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=settings.ALGORITHM)
-            self.token_roles = decoded_token['roles']
-            self.user_id = decoded_token['id']
             expiration_time = decoded_token.get("exp")
             if expiration_time:
                 current_time = datetime.utcnow()
@@ -0,0 +1,68 @@
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.exceptions import FileSizeExceeded
+
+# Запас на заголовки и границы multipart поверх размера самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BodyLimitMiddleware:
+    """
+    Ограничивает размер тела запроса для маршрутов загрузки.
+    limits: путь -> максимальный размер файла в мегабайтах (как MAX_FILE_SIZE у сервисов).
+    Запрос отклоняется сразу по Content-Length, а если его нет или он занижен —
+    как только количество полученных байт превысит лимит.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = {path: size * 1024 * 1024 + MULTIPART_OVERHEAD for path, size in limits.items()}
+
+    @staticmethod
+    def _rejection():
+        return JSONResponse(
+            status_code=403,
+            content={"status": False, "message": "Допустимый размер файла превышен"},
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or (limit := self.limits.get(scope["path"])) is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._rejection()(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise FileSizeExceeded
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            # после превышения ответ приложения (ошибка разбора тела) подменяется нашим
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except FileSizeExceeded:
+            pass
+
+        if exceeded and not response_started:
+            await self._rejection()(scope, receive, send)
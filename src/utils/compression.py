@@ -0,0 +1,142 @@
+import asyncio
+import gzip
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from src.settings import settings
+from src.utils.streaming import discard
+
+try:
+    import brotli
+except ImportError:  # brotli и zstd необязательны, gzip есть всегда
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Accept-Encoding -> суффикс сжатой копии рядом с blob
+SUFFIXES = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+# уровни, если кодировки нет в PRECOMPRESS_LEVELS
+DEFAULT_LEVELS = {"br": 5, "zstd": 9, "gzip": 6}
+
+
+def _level(encoding: str) -> int:
+    return settings.precompress_levels.get(encoding, DEFAULT_LEVELS[encoding])
+
+
+def _gzip(source, out) -> None:
+    # mtime=0: одинаковое содержимое даёт одинаковые байты
+    with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=_level("gzip"), mtime=0) as compressed:
+        while chunk := source.read(READ_CHUNK_SIZE):
+            compressed.write(chunk)
+
+
+def _brotli(source, out) -> None:
+    compressor = brotli.Compressor(quality=_level("br"))
+    while chunk := source.read(READ_CHUNK_SIZE):
+        out.write(compressor.process(chunk))
+    out.write(compressor.finish())
+
+
+def _zstd(source, out) -> None:
+    zstandard.ZstdCompressor(level=_level("zstd")).copy_stream(source, out)
+
+
+COMPRESSORS = {"br": _brotli, "zstd": _zstd, "gzip": _gzip}
+INSTALLED = {"br": brotli is not None, "zstd": zstandard is not None, "gzip": True}
+
+
+def encodings() -> list[str]:
+    """
+    Кодировки из PRECOMPRESS_ENCODINGS, для которых установлен компрессор, в порядке предпочтения
+    """
+    return [encoding for encoding in settings.precompress_encodings if INSTALLED.get(encoding)]
+
+
+def _compress(path: str, encoding: str) -> tuple[str, int]:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".encode-", suffix=SUFFIXES[encoding])
+    try:
+        with open(path, "rb") as source, os.fdopen(fd, "wb") as out:
+            COMPRESSORS[encoding](source, out)
+            out.flush()
+            os.fsync(out.fileno())
+        return tmp_path, os.path.getsize(tmp_path)
+    except BaseException:
+        discard(tmp_path)
+        raise
+
+
+@lru_cache
+def _executor() -> ThreadPoolExecutor:
+    # zlib, brotli и zstd отпускают GIL на время сжатия, поэтому достаточно потоков
+    return ThreadPoolExecutor(max_workers=settings.precompress_workers, thread_name_prefix="precompress")
+
+
+async def precompress(path: str, size: int) -> dict[str, str]:
+    """
+    Сжатые копии файла во временных файлах рядом с ним: кодировка -> путь.
+    Копии, которые экономят меньше (1 - PRECOMPRESS_MAX_RATIO) размера, отбрасываются.
+    """
+    if size < settings.precompress_min_size:
+        return {}
+    selected = encodings()
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(_executor(), _compress, path, encoding) for encoding in selected),
+        return_exceptions=True,
+    )
+    siblings = {}
+    for encoding, result in zip(selected, results):
+        # без сжатой копии файл просто отдаётся как есть
+        if isinstance(result, Exception):
+            continue
+        tmp_path, compressed_size = result
+        if compressed_size <= size * settings.precompress_max_ratio:
+            siblings[encoding] = tmp_path
+        else:
+            discard(tmp_path)
+    return siblings
+
+
+def _accepted(header: str) -> dict[str, float]:
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def negotiate(header: Optional[str], available: tuple[str, ...]) -> Optional[str]:
+    """
+    Выбор сжатой копии по Accept-Encoding (RFC 9110): наибольший q, при равенстве —
+    порядок available. None — отдаётся исходный файл: подходящей копии нет или клиент
+    предпочитает identity (identity;q=1, br;q=0.5). Неуказанный identity допустим,
+    но сжатой копии не предпочтительнее.
+    """
+    if not header or not available:
+        return None
+    accepted = _accepted(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    if best is not None and accepted.get("identity", accepted.get("*", 0.0)) > best_quality:
+        return None
+    return best
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+
+from cachetools import LRUCache
+from starlette.concurrency import run_in_threadpool
+
+from src.settings import settings
+from src.utils.metadata_cache import FileMeta
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class _CountingLRUCache(LRUCache):
+    def __init__(self, maxsize: int, getsizeof=None):
+        super().__init__(maxsize, getsizeof=getsizeof)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class DownloadCache:
+    """
+    Содержимое небольших популярных файлов в памяти воркера, LRU с ограничением по суммарному размеру.
+    Файлы крупнее max_file_size в кэш не попадают и отдаются с диска потоково.
+    Ключ включает путь, размер и mtime, поэтому изменённый файл не будет отдан из кэша.
+    """
+
+    def __init__(self, max_bytes: int, max_file_size: int):
+        self.max_file_size = max_file_size
+        self._cache = _CountingLRUCache(maxsize=max_bytes, getsizeof=len)
+        self._loading: dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, meta: FileMeta) -> bool:
+        return meta.size <= self.max_file_size
+
+    async def get(self, meta: FileMeta) -> Optional[bytes]:
+        if not self.cacheable(meta):
+            return None
+
+        key = (meta.path, meta.size, meta.mtime)
+        data = self._cache.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        # параллельные промахи по одному файлу читают его с диска один раз
+        if (loading := self._loading.get(key)) is not None:
+            return await asyncio.shield(loading)
+
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            data = await run_in_threadpool(_read, meta.path)
+            self._cache[key] = data
+            loading.set_result(data)
+        except BaseException as e:
+            loading.set_exception(e)
+            # исключение уже передано ожидающим, само future больше никто не читает
+            loading.exception()
+            raise
+        finally:
+            del self._loading[key]
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._cache.evictions,
+            "items": len(self._cache),
+            "bytes": self._cache.currsize,
+            "max_bytes": self._cache.maxsize,
+        }
+
+
+download_cache = DownloadCache(settings.download_cache_bytes, settings.download_cache_max_file)
@@ -3,4 +3,6 @@ class RepositoryException(Exception): ...
 
 class ResultNotFound(RepositoryException): ...
 
-class FileSizeExceeded(Exception): ...
\ No newline at end of file
+class FileSizeExceeded(Exception): ...
+
+class QuotaExceeded(Exception): ...
\ No newline at end of file
@@ -0,0 +1,273 @@
+import ipaddress
+import os
+import secrets
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+from urllib.parse import quote
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response, StreamingResponse
+
+from src.settings import settings
+from src.utils.metadata_cache import FileMeta
+from src.utils.zip_stream import ZipLayout, ZipEntry
+
+# Содержимое по ключу файла или URL с sha256 никогда не меняется, поэтому такие ответы можно кэшировать навсегда.
+# APK загружается заново под тем же именем, поэтому такие ответы каждый раз перепроверяются по ETag.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+MAX_RANGES = 16
+READ_CHUNK_SIZE = 64 * 1024
+
+OFFLOAD_HEADERS = {"x-accel-redirect": "X-Accel-Redirect", "x-sendfile": "X-Sendfile"}
+
+# Часть тела ответа: готовые байты или диапазон файла [start, end] включительно
+Segment = Union[bytes, tuple[int, int]]
+
+
+def etag(meta: FileMeta) -> str:
+    if meta.digest:
+        return f'"{meta.digest}"'
+    return f'W/"{meta.size:x}-{int(meta.mtime):x}"'
+
+
+def cache_control(meta: FileMeta) -> str:
+    return IMMUTABLE_CACHE_CONTROL if meta.immutable else REVALIDATE_CACHE_CONTROL
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _none_match(header: str, current: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return any(_opaque(tag.strip()) == _opaque(current) for tag in header.split(","))
+
+
+def _not_modified_since(header: str, meta: FileMeta) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    # дата без часового пояса (-0000) — это UTC, а не местное время сервера
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return int(meta.mtime) <= since.timestamp()
+
+
+def _if_range_matches(header: str, meta: FileMeta, current: str) -> bool:
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        # If-Range допускает только сильное сравнение
+        return not current.startswith("W/") and header == current
+    return header == formatdate(meta.mtime, usegmt=True)
+
+
+def parse_range(header: str, size: int) -> Optional[list[tuple[int, int]]]:
+    """
+    Разбирает заголовок Range (RFC 7233).
+    None — заголовок некорректен и игнорируется, пустой список — ни один диапазон не выполним.
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        start, dash, end = spec.strip().partition("-")
+        if not dash:
+            return None
+        if not start:
+            if not end.isdigit():
+                return None
+            if int(end) > 0 and size > 0:
+                ranges.append((max(size - int(end), 0), size - 1))
+            continue
+        if not start.isdigit() or (end and not end.isdigit()):
+            return None
+        first = int(start)
+        if end and int(end) < first:
+            return None
+        if first < size:
+            ranges.append((first, min(int(end), size - 1) if end else size - 1))
+    return ranges
+
+
+async def _iter_segments(path: str, segments: list[Segment]) -> AsyncIterator[bytes]:
+    fd = await run_in_threadpool(os.open, path, os.O_RDONLY)
+    try:
+        for segment in segments:
+            if isinstance(segment, bytes):
+                yield segment
+                continue
+            position, end = segment
+            while position <= end:
+                length = min(READ_CHUNK_SIZE, end - position + 1)
+                chunk = await run_in_threadpool(os.pread, fd, length, position)
+                if not chunk:
+                    return
+                yield chunk
+                position += len(chunk)
+    finally:
+        await run_in_threadpool(os.close, fd)
+
+
+def _segments_length(segments: list[Segment]) -> int:
+    return sum(len(s) if isinstance(s, bytes) else s[1] - s[0] + 1 for s in segments)
+
+
+def _body(meta: FileMeta, data: Optional[bytes], segments: list[Segment], status_code: int,
+          headers: dict, media_type: str) -> Response:
+    headers["content-length"] = str(_segments_length(segments))
+    if data is not None:
+        body = b"".join(s if isinstance(s, bytes) else data[s[0]:s[1] + 1] for s in segments)
+        return Response(body, status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_segments(meta.path, segments), status_code=status_code,
+                             headers=headers, media_type=media_type)
+
+
+def not_modified(request_headers: Headers, meta: FileMeta) -> Optional[Response]:
+    """
+    304 по If-None-Match / If-Modified-Since (RFC 7232); If-None-Match имеет приоритет
+    """
+    current = etag(meta)
+    headers = {"etag": current, "cache-control": cache_control(meta)}
+    if (if_none_match := request_headers.get("if-none-match")) is not None:
+        if _none_match(if_none_match, current):
+            return Response(status_code=304, headers=headers)
+        return None
+    if (if_modified_since := request_headers.get("if-modified-since")) is not None:
+        if _not_modified_since(if_modified_since, meta):
+            return Response(status_code=304, headers=headers)
+    return None
+
+
+def file_response(request_headers: Headers, meta: FileMeta, data: Optional[bytes] = None) -> Response:
+    """
+    Ответ с содержимым файла: целиком (200), одним диапазоном (206), несколькими диапазонами
+    (206 multipart/byteranges) или 416. data — содержимое из кэша, иначе файл читается с диска потоково.
+    """
+    current = etag(meta)
+    headers = {
+        "etag": current,
+        "last-modified": formatdate(meta.mtime, usegmt=True),
+        "cache-control": cache_control(meta),
+        "accept-ranges": "bytes",
+    }
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header is None or (if_range is not None and not _if_range_matches(if_range, meta, current)):
+        return _body(meta, data, [(0, meta.size - 1)] if meta.size else [], 200, headers, meta.media_type)
+
+    ranges = parse_range(range_header, meta.size)
+    if ranges is None or len(ranges) > MAX_RANGES:
+        return _body(meta, data, [(0, meta.size - 1)] if meta.size else [], 200, headers, meta.media_type)
+    if not ranges:
+        headers["content-range"] = f"bytes */{meta.size}"
+        return Response(status_code=416, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["content-range"] = f"bytes {start}-{end}/{meta.size}"
+        return _body(meta, data, [ranges[0]], 206, headers, meta.media_type)
+
+    boundary = secrets.token_hex(16)
+    segments: list[Segment] = []
+    for start, end in ranges:
+        segments.append(
+            f"--{boundary}\r\ncontent-type: {meta.media_type}\r\n"
+            f"content-range: bytes {start}-{end}/{meta.size}\r\n\r\n".encode()
+        )
+        segments.append((start, end))
+        segments.append(b"\r\n")
+    segments.append(f"--{boundary}--\r\n".encode())
+    return _body(meta, data, segments, 206, headers, f"multipart/byteranges; boundary={boundary}")
+
+
+def _accel_location(path: str) -> Optional[str]:
+    path = os.path.abspath(path)
+    for root, prefix in settings.download_offload_locations:
+        if os.path.commonpath([root, path]) == root:
+            return prefix.rstrip("/") + "/" + quote(os.path.relpath(path, root))
+    return None
+
+
+def _trusted_proxy(client: Optional[str]) -> bool:
+    if not client:
+        return False
+    try:
+        address = ipaddress.ip_address(client)
+    except ValueError:
+        return False
+    return any(address in network for network in settings.download_offload_trusted_proxies)
+
+
+def offload_response(request_headers: Headers, meta: FileMeta, client: Optional[str] = None) -> Optional[Response]:
+    """
+    Передаёт отдачу файла обратному прокси (nginx X-Accel-Redirect или X-Sendfile),
+    Range и сам файл обслуживает прокси. В режиме auto заголовок выбирается по X-Sendfile-Type,
+    если запрос пришёл от доверенного прокси (client — адрес соединения); иначе, как и в режиме none,
+    возвращает None и файл отдаётся приложением.
+    """
+    mode = settings.download_offload
+    if mode == "auto":
+        # заголовок от клиента напрямую заставил бы приложение вернуть пустой ответ с путём файла
+        mode = (request_headers.get("x-sendfile-type") or "").lower() if _trusted_proxy(client) else None
+    if mode not in OFFLOAD_HEADERS:
+        return None
+
+    if mode == "x-accel-redirect":
+        location = _accel_location(meta.path)
+        # файл вне настроенных каталогов nginx не найдёт, его отдаёт приложение
+        if location is None:
+            return None
+    else:
+        location = meta.path
+
+    headers = {
+        OFFLOAD_HEADERS[mode]: location,
+        "etag": etag(meta),
+        "last-modified": formatdate(meta.mtime, usegmt=True),
+        "cache-control": cache_control(meta),
+    }
+    return Response(headers=headers, media_type=meta.media_type)
+
+
+def archive_response(request_headers: Headers, layout: ZipLayout, filename: str,
+                     resolve: Callable[[ZipEntry], Awaitable[Optional[str]]]) -> Response:
+    """
+    ZIP-архив потоком: целиком (200) или одним диапазоном (206) для докачки.
+    If-Range сверяется с ETag раскладки: если набор файлов изменился, архив отдаётся заново целиком.
+    """
+    headers = {
+        "etag": layout.etag,
+        "cache-control": "private, no-cache",
+        "accept-ranges": "bytes",
+        "content-disposition": f'attachment; filename="{filename}"',
+    }
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None and _none_match(if_none_match, layout.etag):
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, layout.size - 1, 200
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header is not None and (if_range is None or if_range.strip() == layout.etag):
+        ranges = parse_range(range_header, layout.size)
+        if ranges == []:
+            headers["content-range"] = f"bytes */{layout.size}"
+            return Response(status_code=416, headers=headers)
+        # несколько диапазонов архиву не нужны, такой запрос получает архив целиком
+        if ranges is not None and len(ranges) == 1:
+            (start, end), status_code = ranges[0], 206
+            headers["content-range"] = f"bytes {start}-{end}/{layout.size}"
+
+    headers["content-length"] = str(end - start + 1)
+    return StreamingResponse(layout.iter_range(start, end, resolve), status_code=status_code,
+                             headers=headers, media_type="application/zip")
@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import os
+import struct
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException
+
+from src.adapters.storage.disk_cache import DiskCache
+from src.settings import settings
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+except ImportError:  # без Pillow фото сохраняются как есть, варианты недоступны
+    Image = None
+    UnidentifiedImageError = None
+    IMAGE_ERRORS = ()
+
+# форматы, которые перекодируются при загрузке; остальные сохраняются как есть
+OPTIMIZED_FORMATS = {"JPEG", "PNG"}
+VARIANT_FORMATS = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+EXTENSION_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png"}
+# расширения загрузок, которые перекодируются (.ico и .mpeg сохраняются как есть)
+OPTIMIZED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+# сегменты JPEG с метаданными: APP1 (EXIF, XMP), APP12, APP13 (IPTC), COM; APP0, APP2 (ICC) и APP14 нужны декодеру
+JPEG_METADATA_MARKERS = {0xE1, 0xEC, 0xED, 0xFE}
+PNG_METADATA_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"eXIf", b"tIME"}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def optimizable(extension: str) -> bool:
+    return available() and extension.lower() in OPTIMIZED_EXTENSIONS
+
+
+def _flatten(image):
+    # палитра без прозрачности — RGB: RGBA добавил бы канал, которого в изображении нет
+    return image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+
+def _save(image, path: str, fmt: str, quality: int, icc_profile: Optional[bytes] = None) -> None:
+    if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image.mode == "P" and fmt != "PNG":
+        image = _flatten(image)
+    # PNG с палитрой сохраняется с палитрой: так он обычно и меньше
+    options = {"icc_profile": icc_profile} if icc_profile else {}
+    image.save(path, format=fmt, quality=quality, optimize=True, **options)
+
+
+def _strip_jpeg(data: bytes) -> Optional[bytes]:
+    if data[:2] != b"\xff\xd8":
+        return None
+    kept, position = [data[:2]], 2
+    while position + 4 <= len(data) and data[position] == 0xFF:
+        marker = data[position + 1]
+        if marker == 0xDA:
+            # дальше сжатые данные скана — копируются без изменений
+            return b"".join(kept) + data[position:]
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if marker == 0xFF or 0xD0 <= marker <= 0xD9 or length < 2 or position + 2 + length > len(data):
+            # заполнители, маркеры без длины или обрезанный сегмент: файл остаётся перекодированным
+            return None
+        if marker not in JPEG_METADATA_MARKERS:
+            kept.append(data[position:position + 2 + length])
+        position += 2 + length
+    return None
+
+
+def _strip_png(data: bytes) -> Optional[bytes]:
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    kept, position = [PNG_SIGNATURE], len(PNG_SIGNATURE)
+    while position + 12 <= len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        end = position + 12 + length
+        if kind not in PNG_METADATA_CHUNKS:
+            kept.append(data[position:end])
+        if kind == b"IEND":
+            return b"".join(kept)
+        position = end
+    return None
+
+
+def _strip_metadata(path: str, fmt: str) -> Optional[bytes]:
+    """
+    Исходные байты без блоков метаданных, сами пиксели не перекодируются.
+    None — структуру файла разобрать не удалось.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return _strip_jpeg(data) if fmt == "JPEG" else _strip_png(data)
+
+
+def _optimize(path: str, quality: int) -> None:
+    """
+    Убирает метаданные (EXIF с GPS, комментарии, текстовые блоки PNG) и перекодирует изображение на месте.
+    Ориентация из EXIF применяется к пикселям, чтобы снимок не повернулся; цветовой профиль сохраняется.
+    Если перекодированный файл не меньше исходного, остаются исходные байты без блоков метаданных.
+    Файл, который Pillow не распознал как изображение, сохраняется без изменений.
+    """
+    try:
+        image = Image.open(path)
+    except UnidentifiedImageError:
+        return
+    with image:
+        fmt = image.format
+        if fmt not in OPTIMIZED_FORMATS:
+            return
+        icc_profile = image.info.get("icc_profile")
+        # исходные байты можно оставить, только если EXIF не требует поворота: тег ориентации удаляется вместе с EXIF
+        rotated = image.getexif().get(0x0112, 1) != 1
+        transposed = ImageOps.exif_transpose(image)
+        tmp_path = path + ".optimized"
+        try:
+            _save(transposed, tmp_path, fmt, quality, icc_profile)
+            stripped = None if rotated else _strip_metadata(path, fmt)
+            if stripped is not None and len(stripped) <= os.path.getsize(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    f.write(stripped)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def _render(source: str, destination: str, width: Optional[int], fmt: str, quality: int) -> bool:
+    with Image.open(source) as image:
+        icc_profile = image.info.get("icc_profile")
+        if width and image.width > width:
+            # JPEG декодируется сразу в уменьшенном масштабе (не меньше width по обеим сторонам)
+            image.draft("RGB", (width, width))
+        image = ImageOps.exif_transpose(image)
+        if width and image.width > width:
+            if image.mode == "P":
+                # палитру Pillow масштабирует только ближайшим соседом
+                image = _flatten(image)
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        _save(image, destination, fmt.upper(), quality, icc_profile)
+    return True
+
+
+@lru_cache
+def _executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=settings.image_workers)
+
+
+def _replace_executor(executor: ProcessPoolExecutor) -> None:
+    # пул пересоздаёт только первый заметивший сбой: остальные уже получат новый из _executor()
+    if _executor() is executor:
+        _executor.cache_clear()
+    executor.shutdown(wait=False)
+
+
+async def _run(function, *args):
+    """
+    Задание в пуле процессов. Если рабочий процесс упал (например, его убил OOM на огромном изображении),
+    пул сломан для всех заданий: он пересоздаётся, задание повторяется один раз.
+    """
+    if not available():
+        raise HTTPException(501, "Обработка изображений недоступна")
+    for attempt in range(2):
+        executor = _executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        except IMAGE_ERRORS as e:
+            raise HTTPException(400, "Не удалось обработать изображение") from e
+        except BrokenProcessPool as e:
+            _replace_executor(executor)
+            if attempt:
+                raise HTTPException(400, "Не удалось обработать изображение") from e
+
+
+async def optimize(path: str) -> None:
+    """
+    Убирает метаданные и перекодирует фото в пуле процессов (не в потоках event loop: Pillow держит GIL)
+    """
+    await _run(_optimize, path, settings.image_quality)
+
+
+def variant_width(width: Optional[int]) -> Optional[int]:
+    """
+    Ширина округляется вверх до одной из IMAGE_VARIANT_WIDTHS, чтобы произвольные w
+    не заполняли кэш вариантами, отличающимися на пиксель
+    """
+    if width is None:
+        return None
+    widths = settings.image_variant_widths
+    return widths[min(bisect.bisect_left(widths, width), len(widths) - 1)]
+
+
+def variant_format(name: str, fmt: Optional[str]) -> str:
+    # без fmt вариант сохраняет формат оригинала, если его можно закодировать
+    return fmt or EXTENSION_FORMATS.get(Path(name).suffix.lower(), "webp")
+
+
+async def render_variant(source: str, destination: str, width: Optional[int], fmt: str) -> bool:
+    return await _run(_render, source, destination, width, fmt, settings.image_quality)
+
+
+variant_cache = DiskCache(settings.image_variant_dir, settings.image_variant_cache_bytes)
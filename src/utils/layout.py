@@ -0,0 +1,42 @@
+import hashlib
+import os
+
+from src.settings import settings
+
+
+def fanout(name: str, depth: int = None, width: int = None) -> list[str]:
+    """
+    Промежуточные каталоги для имени файла: ab/cd для depth=2, width=2.
+    Берутся из md5 имени, а не из самого имени — у ключей с временным префиксом
+    и у имён APK первые символы почти не меняются.
+    """
+    depth = settings.storage_fanout_depth if depth is None else depth
+    width = settings.storage_fanout_width if width is None else width
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return [digest[i * width:(i + 1) * width] for i in range(depth)]
+
+
+def sharded_key(prefix: str, name: str) -> str:
+    """
+    Путь относительно корня хранилища: <prefix>/ab/cd/<name>
+    """
+    return os.path.join(prefix, *fanout(name), name)
+
+
+def flat_key(prefix: str, name: str) -> str:
+    return os.path.join(prefix, name)
+
+
+def legacy_path(prefix: str, name: str, stored: str = None) -> str:
+    """
+    Абсолютный путь файла без blob. После migrate_layout в files.path записан ключ файла —
+    он и используется, даже если настройки fanout с тех пор изменились. В строках, которые
+    ещё не перенесены, path — каталог типа, и путь ищется в разбитой раскладке, затем в плоской.
+    Проверяет существование файла, поэтому из асинхронного кода вызывается через run_in_threadpool.
+    """
+    if stored and os.path.basename(stored) == name:
+        return os.path.join(settings.file_storage, stored)
+    path = os.path.join(settings.file_storage, sharded_key(prefix, name))
+    if os.path.exists(path):
+        return path
+    return os.path.join(settings.file_storage, flat_key(prefix, name))
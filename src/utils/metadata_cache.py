@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from cachetools import TTLCache
+
+from src.settings import settings
+
+
+@dataclass(frozen=True)
+class FileMeta:
+    path: Optional[str]
+    type: str
+    is_active: bool
+    size: int = 0
+    mtime: float = 0.0
+    media_type: Optional[str] = None
+    digest: Optional[str] = None
+    # ключ blob в хранилище; None у старых файлов без blob
+    key: Optional[str] = None
+    # сжатые копии blob, доступные для Accept-Encoding
+    encodings: tuple[str, ...] = ()
+    # по URL никогда не отдаётся другое содержимое (ключ файла, кроме APK, или подпись с sha256)
+    immutable: bool = False
+
+
+class FileMetadataCache:
+    """
+    Кэш hash -> метаданные файла внутри воркера (LRU с TTL).
+    Отсутствующие и деактивированные файлы тоже кэшируются, чтобы 404 не ходили в БД,
+    но на короткий negative_ttl: только что загруженный файл может ещё не дойти до реплики.
+    Инвалидация локальная: другие воркеры увидят деактивацию не позже чем через ttl.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._missing = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+
+    def get(self, type_name: str, hashed: str) -> Optional[FileMeta]:
+        key = (type_name, hashed)
+        return self._cache.get(key) or self._missing.get(key)
+
+    def set(self, hashed: str, meta: FileMeta) -> None:
+        (self._cache if meta.is_active else self._missing)[(meta.type, hashed)] = meta
+
+    def invalidate(self, type_name: str, hashed: str) -> None:
+        self._cache.pop((type_name, hashed), None)
+        self._missing.pop((type_name, hashed), None)
+
+
+file_metadata_cache = FileMetadataCache(settings.metadata_cache_size, settings.metadata_cache_ttl,
+                                        settings.metadata_negative_ttl)
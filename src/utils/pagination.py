@@ -0,0 +1,20 @@
+import base64
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(create_date: datetime, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{create_date.isoformat()}|{id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        create_date, id = raw.split("|")
+        return datetime.fromisoformat(create_date), int(id)
+    except ValueError:
+        raise HTTPException(400, "Неверный курсор")
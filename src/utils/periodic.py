@@ -0,0 +1,15 @@
+import asyncio
+import traceback
+from typing import Awaitable, Callable
+
+
+async def run_periodically(interval: float, job: Callable[[], Awaitable[None]]) -> None:
+    """
+    Запускает фоновую задачу каждые interval секунд; ошибка одного запуска не останавливает цикл
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            traceback.print_exc()
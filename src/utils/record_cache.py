@@ -0,0 +1,38 @@
+from typing import Optional
+
+import orjson
+
+from src.adapters.cache.memcached import AsyncMemcachedClient, memcached_client
+from src.settings import settings
+
+
+class FileRecordCache:
+    """
+    Общий для всех воркеров кэш строк files в memcached: (type, hash) -> поля, нужные для отдачи.
+    Промах метаданных в одном воркере не идёт в БД, если файл уже запрашивали в другом,
+    а инвалидация при загрузке и деактивации видна сразу всем воркерам.
+    Пустой словарь — файла нет; такие записи живут negative_ttl.
+    """
+
+    def __init__(self, client: AsyncMemcachedClient, ttl: int, negative_ttl: int):
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    @staticmethod
+    def _key(type_name: str, hashed: str) -> str:
+        return f"file:{type_name}:{hashed}"
+
+    async def get(self, type_name: str, hashed: str) -> Optional[dict]:
+        value = await self.client.get(self._key(type_name, hashed))
+        return orjson.loads(value) if value is not None else None
+
+    async def set(self, type_name: str, hashed: str, record: dict) -> None:
+        await self.client.set(self._key(type_name, hashed), orjson.dumps(record),
+                              self.ttl if record else self.negative_ttl)
+
+    async def invalidate(self, type_name: str, hashed: str) -> None:
+        await self.client.delete(self._key(type_name, hashed))
+
+
+file_record_cache = FileRecordCache(memcached_client, settings.metadata_cache_ttl, settings.metadata_negative_ttl)
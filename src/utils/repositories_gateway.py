@@ -3,11 +3,16 @@ from typing import Protocol
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.adapters.database.repositories import FileRepository
+from src.adapters.database.repositories import FileRepository, UploadSessionRepository, UploadChunkRepository, \
+    BlobRepository, UsageRepository
 
 
 class RepositoriesGatewayProtocol(Protocol):
     file: FileRepository
+    blob: BlobRepository
+    upload_session: UploadSessionRepository
+    upload_chunk: UploadChunkRepository
+    usage: UsageRepository
 
     @abstractmethod
     def __init__(self, session: AsyncSession):
@@ -1,7 +1,7 @@
 from abc import abstractmethod
 from typing import Any, Protocol, Callable
 
-from sqlalchemy import func, insert, select, update, desc, asc
+from sqlalchemy import func, insert, select, update, delete, desc, asc
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
@@ -32,6 +32,15 @@ class SQLAlchemyRepository(AbstractRepository):
         except NoResultFound:
             raise ResultNotFound
 
+    async def add_many(self, data: list[dict]):
+        """
+        Вставка нескольких строк одним INSERT ... RETURNING (executemany / insertmanyvalues)
+        """
+        if not data:
+            return []
+        res = await self.session.scalars(insert(self.model).returning(self.model), data)
+        return res.all()
+
     async def edit_one(self, id: int, data: dict):
         stmt = update(self.model).values(**data).filter_by(id=id).returning(self.model)
         res = await self.session.execute(stmt)
@@ -40,6 +49,25 @@ class SQLAlchemyRepository(AbstractRepository):
         except NoResultFound:
             raise ResultNotFound
 
+    async def edit_many(self, data: list[dict]) -> None:
+        """
+        Пакетное обновление по первичному ключу: в каждом словаре должен быть id
+        """
+        if data:
+            await self.session.execute(update(self.model), data)
+
+    async def deactivate_many(self, ids: list[int] = None, hashes: list[str] = None, **filter_by):
+        """
+        Снимает is_active одним UPDATE по списку id или hash; возвращает затронутые строки
+        """
+        stmt = update(self.model).filter_by(is_active=True, **filter_by).values(is_active=False)
+        if ids is not None:
+            stmt = stmt.filter(self.model.id.in_(ids))
+        if hashes is not None:
+            stmt = stmt.filter(self.model.hash.in_(hashes))
+        res = await self.session.execute(stmt.returning(self.model))
+        return res.scalars().fetchall()
+
     async def find_all(self):
         stmt = select(self.model).options(*self.get_select_options())
         res = await self.session.execute(stmt)
@@ -78,7 +106,12 @@ class SQLAlchemyRepository(AbstractRepository):
         return res.scalar()
 
     async def delete_one(self, id: int) -> None:
-        await self.session.delete((await self.find_one(id=id)))
+        res = await self.session.execute(delete(self.model).filter_by(id=id).returning(self.model.id))
+        if res.first() is None:
+            raise ResultNotFound
+
+    async def delete_many(self, ids: list[int]) -> None:
+        await self.session.execute(delete(self.model).filter(self.model.id.in_(ids)))
 
     def get_select_options(self) -> list[ExecutableOption]:
         return []
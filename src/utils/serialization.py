@@ -0,0 +1,31 @@
+from typing import Iterable, Optional
+
+import orjson
+
+from src.utils.signing import url_signature
+
+
+def file_item(row, type_name: str, url_prefix: str) -> dict:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "hash": row.hash,
+        "create_date": row.create_date,
+        "url": url_prefix + row.hash + url_signature(type_name, row.hash, row.digest),
+    }
+
+
+def files_page_json(rows: Iterable, type_name: str, url_prefix: str, next_cursor: Optional[str]) -> bytes:
+    """
+    Сериализует страницу списка файлов (формат AllFilesOutput) сразу из строк выборки,
+    без промежуточных pydantic-моделей
+    """
+    return orjson.dumps({
+        "status": True,
+        "items": [file_item(row, type_name, url_prefix) for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+
+def files_ndjson(rows: Iterable, type_name: str, url_prefix: str) -> bytes:
+    return b"".join(orjson.dumps(file_item(row, type_name, url_prefix)) + b"\n" for row in rows)
@@ -0,0 +1,47 @@
+import base64
+import hashlib
+import hmac
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+from starlette.datastructures import QueryParams
+
+from src.settings import settings
+
+
+def _signature(type_name: str, hashed: str, digest: str, expires: int) -> str:
+    message = f"{type_name}\n{hashed}\n{digest}\n{expires}".encode()
+    mac = hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac).decode().rstrip("=")
+
+
+def url_signature(type_name: str, hashed: str, digest: Optional[str]) -> str:
+    """
+    Строка запроса подписанной ссылки (exp, d, sig) или пустая строка, если подписи выключены.
+    В подпись входит и sha256 содержимого: по нему путь к blob находится без обращения к БД,
+    поэтому удаление файла не отзывает уже выданную ссылку — она действует SIGNED_URL_TTL секунд.
+    """
+    if not settings.signed_urls:
+        return ""
+    expires = int(time.time()) + settings.signed_url_ttl
+    digest = digest or ""
+    return "?" + urlencode({"exp": expires, "d": digest, "sig": _signature(type_name, hashed, digest, expires)})
+
+
+def file_url(type_name: str, hashed: str, digest: Optional[str] = None) -> str:
+    return settings.file_server_url + "files/" + type_name + "/" + hashed + url_signature(type_name, hashed, digest)
+
+
+def verify_signature(type_name: str, hashed: str, query: QueryParams) -> Optional[str]:
+    """
+    Проверяет подпись ссылки за постоянное время. Возвращает sha256 содержимого
+    (None для файлов без blob); при неверной или просроченной подписи — 403.
+    """
+    expires, digest, signature = query.get("exp", ""), query.get("d", ""), query.get("sig", "")
+    if not expires.isdigit() or int(expires) < time.time():
+        raise HTTPException(403, "Срок действия ссылки истёк")
+    if not hmac.compare_digest(signature, _signature(type_name, hashed, digest, int(expires))):
+        raise HTTPException(403, "Неверная подпись ссылки")
+    return digest or None
@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Protocol
+
+from src.settings import settings
+
+
+class StorageKeyGenerator(Protocol):
+    async def generate(self, filename: str, extension: str) -> str:
+        ...
+
+
+class RandomKeyGenerator:
+    """
+    Ключ вида <время в мс, hex><128 бит случайности><расширение>.
+    Временной префикс сохраняет сортировку по времени загрузки (как у ULID),
+    128 случайных бит исключают коллизии.
+    """
+
+    async def generate(self, filename: str, extension: str) -> str:
+        return f"{time.time_ns() // 1_000_000:012x}{secrets.token_hex(16)}{extension}"
+
+
+class PBKDF2KeyGenerator:
+    """
+    Старая схема именования (соль + pbkdf2 от имени файла).
+    Хэширование выполняется в ограниченном пуле потоков, чтобы не блокировать event loop.
+    """
+
+    ITERATIONS = 100000
+
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-key")
+
+    def _hash(self, filename: str, extension: str) -> str:
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac('sha256', filename.encode(), salt, self.ITERATIONS)
+        return salt.hex() + ':' + digest.hex()[:64] + extension
+
+    async def generate(self, filename: str, extension: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._hash, filename, extension)
+
+
+@lru_cache
+def get_key_generator() -> StorageKeyGenerator:
+    if settings.storage_key_scheme == "pbkdf2":
+        return PBKDF2KeyGenerator(settings.storage_key_workers)
+    if settings.storage_key_scheme == "random":
+        return RandomKeyGenerator()
+    raise ValueError(f"Unknown storage key scheme: {settings.storage_key_scheme}")
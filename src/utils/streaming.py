@@ -0,0 +1,187 @@
+import hashlib
+import os
+import tempfile
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from src.utils.exceptions import FileSizeExceeded
+
+
+@dataclass
+class WriteResult:
+    path: str
+    size: int
+    digest: str
+
+
+def _write_chunk(out, hasher, chunk: bytes) -> None:
+    # hashlib отпускает GIL на больших буферах, поэтому хэш считается в том же потоке, что и запись
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+def _sync_and_close(out) -> None:
+    out.flush()
+    os.fsync(out.fileno())
+    out.close()
+
+
+def _sync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def stage_upload(source: UploadFile, directory: str, chunk_size: int) -> WriteResult:
+    """
+    Копирует загруженный файл во временный файл в directory блоками по chunk_size байт
+    и сбрасывает его на диск. Размер и sha256 считаются за тот же проход.
+    На место файл переносит publish(), после того как метаданные записаны в БД.
+    """
+    await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=directory, prefix=".upload-", suffix=".tmp")
+    out = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        await source.seek(0)
+        while chunk := await source.read(chunk_size):
+            await run_in_threadpool(_write_chunk, out, hasher, chunk)
+            size += len(chunk)
+        await run_in_threadpool(_sync_and_close, out)
+    except BaseException:
+        out.close()
+        await run_in_threadpool(discard, tmp_path)
+        raise
+
+    return WriteResult(path=tmp_path, size=size, digest=hasher.hexdigest())
+
+
+def digest_stream(stream, chunk_size: int) -> tuple[str, int, int]:
+    """
+    sha256, размер и CRC32 потока от текущей позиции до конца (в том числе без seek,
+    например тела ответа S3). Блокирующая, вызывается в пуле потоков.
+    """
+    hasher = hashlib.sha256()
+    crc = 0
+    size = 0
+    while chunk := stream.read(chunk_size):
+        hasher.update(chunk)
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+    return hasher.hexdigest(), size, crc
+
+
+def _digest_fileobj(fileobj, chunk_size: int) -> tuple[str, int, int]:
+    fileobj.seek(0)
+    result = digest_stream(fileobj, chunk_size)
+    fileobj.seek(0)
+    return result
+
+
+def _digest_path(path: str, chunk_size: int) -> tuple[str, int, int]:
+    with open(path, "rb") as f:
+        return _digest_fileobj(f, chunk_size)
+
+
+async def digest_upload(source: UploadFile, chunk_size: int) -> tuple[str, int, int]:
+    """
+    sha256, размер и CRC32 (для ZIP-экспорта) загруженного файла за один проход по буферу Starlette,
+    без записи в хранилище
+    """
+    return await run_in_threadpool(_digest_fileobj, source.file, chunk_size)
+
+
+async def digest_file(path: str, chunk_size: int) -> tuple[str, int, int]:
+    return await run_in_threadpool(_digest_path, path, chunk_size)
+
+
+def allocate(path: str, size: int) -> None:
+    """
+    Создаёт (разреженный) файл заданного размера, в который части пишутся по своим смещениям
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def publish(source: str, destination: str) -> None:
+    """
+    Сбрасывает собранный файл на диск и атомарно переносит его на место
+    """
+    fd = os.open(source, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+    os.replace(source, destination)
+    _sync_directory(directory)
+
+
+async def stage_stream(stream: AsyncIterator[bytes], directory: str, limit: int, buffer_size: int) -> WriteResult:
+    """
+    Пишет поток во временный файл в directory, считая размер и sha256 за тот же проход.
+    Если поток длиннее limit байт — прерывает запись с FileSizeExceeded и удаляет файл.
+    """
+    await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=directory, prefix=".chunk-", suffix=".tmp")
+    out = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+
+    try:
+        async for piece in stream:
+            size += len(piece)
+            if size > limit:
+                raise FileSizeExceeded
+            buffer += piece
+            if len(buffer) >= buffer_size:
+                await run_in_threadpool(_write_chunk, out, hasher, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write_chunk, out, hasher, bytes(buffer))
+        out.close()
+    except BaseException:
+        out.close()
+        await run_in_threadpool(discard, tmp_path)
+        raise
+
+    return WriteResult(path=tmp_path, size=size, digest=hasher.hexdigest())
+
+
+def _copy_at_offset(source: str, path: str, offset: int, chunk_size: int) -> None:
+    with open(source, "rb") as src:
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            while chunk := src.read(chunk_size):
+                view = memoryview(chunk)
+                while view:
+                    written = os.pwrite(fd, view, offset)
+                    view = view[written:]
+                    offset += written
+        finally:
+            os.close(fd)
+
+
+async def write_at_offset(source: str, path: str, offset: int, chunk_size: int) -> None:
+    """
+    Копирует проверенный файл source в существующий файл path начиная с offset, не читая path целиком
+    """
+    await run_in_threadpool(_copy_at_offset, source, path, offset, chunk_size)
@@ -0,0 +1,46 @@
+import hashlib
+import time
+from typing import Optional
+
+from cachetools import TLRUCache
+
+from src.settings import settings
+
+
+class VerifiedTokenCache:
+    """
+    Кэш уже проверенных JWT внутри воркера: sha256 токена -> payload.
+    Запись живёт до exp самого токена, сам токен в памяти не хранится.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = TLRUCache(maxsize=maxsize, ttu=lambda key, payload, now: payload["exp"], timer=time.time)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        payload = self._cache.get(key)
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def put(self, key: bytes, payload: dict) -> None:
+        self._cache[key] = payload
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "items": len(self._cache),
+        }
+
+
+verified_tokens = VerifiedTokenCache(settings.jwt_cache_size)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+READ_CHUNK_SIZE = 64 * 1024
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+UTF8_FLAG = 0x0800
+# 4.5 — минимальная версия с ZIP64, 3 — атрибуты Unix
+VERSION_NEEDED = 45
+VERSION_MADE_BY = (3 << 8) | VERSION_NEEDED
+FILE_ATTRIBUTES = 0o100644 << 16
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<IQHHIIQQQQ")
+ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    size: int
+    crc32: int
+    modified: datetime
+    # ключ blob или путь старого файла — то, по чему resolve находит содержимое
+    source: str
+    is_blob: bool
+
+
+def _dos_datetime(value: datetime) -> tuple[int, int]:
+    value = min(max(value, datetime(1980, 1, 1)), datetime(2107, 12, 31, 23, 59, 58))
+    return (
+        (value.hour << 11) | (value.minute << 5) | (value.second // 2),
+        ((value.year - 1980) << 9) | (value.month << 5) | value.day,
+    )
+
+
+def _local_header(entry: ZipEntry, name: bytes) -> bytes:
+    time, date = _dos_datetime(entry.modified)
+    extra = b""
+    size = entry.size
+    if size >= ZIP64_LIMIT:
+        extra = struct.pack("<HHQQ", 0x0001, 16, size, size)
+        size = ZIP64_LIMIT
+    return LOCAL_HEADER.pack(0x04034B50, VERSION_NEEDED, UTF8_FLAG, 0, time, date, entry.crc32,
+                             size, size, len(name), len(extra)) + name + extra
+
+
+def _central_header(entry: ZipEntry, name: bytes, offset: int) -> bytes:
+    time, date = _dos_datetime(entry.modified)
+    fields = []
+    size = entry.size
+    if size >= ZIP64_LIMIT:
+        fields += [size, size]
+        size = ZIP64_LIMIT
+    if offset >= ZIP64_LIMIT:
+        fields.append(offset)
+        offset = ZIP64_LIMIT
+    extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields) if fields else b""
+    return CENTRAL_HEADER.pack(0x02014B50, VERSION_MADE_BY, VERSION_NEEDED, UTF8_FLAG, 0, time, date,
+                               entry.crc32, size, size, len(name), len(extra), 0, 0, 0,
+                               FILE_ATTRIBUTES, offset) + name + extra
+
+
+def _end_records(count: int, directory_offset: int, directory_size: int) -> bytes:
+    records = b""
+    if count >= ZIP64_COUNT_LIMIT or directory_offset >= ZIP64_LIMIT or directory_size >= ZIP64_LIMIT:
+        zip64_offset = directory_offset + directory_size
+        records += ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+            0x06064B50, ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12, VERSION_MADE_BY, VERSION_NEEDED, 0, 0,
+            count, count, directory_size, directory_offset,
+        )
+        records += ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_offset, 1)
+        count = min(count, ZIP64_COUNT_LIMIT)
+        directory_offset = min(directory_offset, ZIP64_LIMIT)
+        directory_size = min(directory_size, ZIP64_LIMIT)
+    return records + END_OF_CENTRAL_DIRECTORY.pack(0x06054B50, 0, 0, count, count, directory_size,
+                                                   directory_offset, 0)
+
+
+# Часть архива: готовые байты или содержимое записи
+Part = Union[bytes, ZipEntry]
+
+
+class ZipLayout:
+    """
+    Раскладка ZIP-архива без сжатия (store): заголовки и смещения вычисляются заранее из имён,
+    размеров и CRC32, поэтому длина архива известна до чтения файлов, а любой диапазон байт
+    можно выдать, не формируя предыдущие. Одинаковый набор записей всегда даёт одинаковый архив.
+    """
+
+    def __init__(self, entries: list[ZipEntry]):
+        self.parts: list[tuple[int, Part]] = []
+        position = 0
+        directory = []
+        for entry in entries:
+            name = entry.name.encode()
+            header = _local_header(entry, name)
+            directory.append(_central_header(entry, name, position))
+            for part in (header, entry):
+                self.parts.append((position, part))
+                position += _length(part)
+        central = b"".join(directory)
+        self.parts.append((position, central + _end_records(len(entries), position, len(central))))
+        self.size = position + _length(self.parts[-1][1])
+        self.etag = '"' + hashlib.sha256(central).hexdigest()[:32] + '"'
+
+    async def iter_range(self, start: int, end: int,
+                         resolve: Callable[[ZipEntry], Awaitable[Optional[str]]]) -> AsyncIterator[bytes]:
+        """
+        Байты архива [start, end] включительно; содержимое файлов читается блоками через pread
+        """
+        for offset, part in self.parts:
+            part_end = offset + _length(part) - 1
+            if part_end < start or offset > end or part_end < offset:
+                continue
+            first, last = max(start, offset) - offset, min(end, part_end) - offset
+            if isinstance(part, bytes):
+                yield part[first:last + 1]
+                continue
+            path = await resolve(part)
+            if path is None:
+                raise FileNotFoundError(part.source)
+            async for chunk in _read(path, first, last):
+                yield chunk
+
+
+def _length(part: Part) -> int:
+    return len(part) if isinstance(part, bytes) else part.size
+
+
+async def _read(path: str, position: int, end: int) -> AsyncIterator[bytes]:
+    fd = await run_in_threadpool(os.open, path, os.O_RDONLY)
+    try:
+        while position <= end:
+            chunk = await run_in_threadpool(os.pread, fd, min(READ_CHUNK_SIZE, end - position + 1), position)
+            if not chunk:
+                # файл короче, чем записано в архиве: обрываем ответ, а не отдаём битый архив
+                raise EOFError(path)
+            yield chunk
+            position += len(chunk)
+    finally:
+        await run_in_threadpool(os.close, fd)
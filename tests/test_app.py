@@ -0,0 +1,15 @@
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.router.files import UPLOAD_BODY_LIMITS
+
+
+def test_body_limit_rejection_has_cors_headers():
+    # без with: startup (миграции, фоновые задачи) не запускается
+    client = TestClient(app)
+    size = UPLOAD_BODY_LIMITS["/upload/photo"] * 1024 * 1024 * 2
+    response = client.post("/upload/photo", content=b"x" * size,
+                           headers={"Origin": "https://app.example.com", "Content-Type": "multipart/form-data"})
+    assert response.status_code == 403
+    assert response.json()["message"] == "Допустимый размер файла превышен"
+    assert response.headers["access-control-allow-origin"] == "*"
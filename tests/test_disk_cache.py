@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from src.adapters.storage import disk_cache
+from src.adapters.storage.disk_cache import DiskCache
+
+
+def _fetcher(calls: list, size: int = 100):
+    async def fetch(destination: str) -> bool:
+        calls.append(destination)
+        await asyncio.sleep(0.01)
+        with open(destination, "wb") as f:
+            f.write(b"x" * size)
+        return True
+    return fetch
+
+
+@pytest.mark.anyio
+async def test_hit_after_read_through(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    calls = []
+    path = await cache.get("blobs/a", _fetcher(calls))
+    assert path == os.path.join(tmp_path, "blobs/a") and os.path.getsize(path) == 100
+    assert await cache.get("blobs/a", _fetcher(calls)) == path
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+@pytest.mark.anyio
+async def test_missing_object_is_not_cached(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+
+    async def missing(destination: str) -> bool:
+        return False
+
+    assert await cache.get("blobs/none", missing) is None
+    assert cache.stats()["items"] == 0
+    # временный файл скачивания не остаётся
+    assert not any(name.startswith(".fetch-") for name in os.listdir(tmp_path / "blobs"))
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_fetch_once(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    calls = []
+    paths = await asyncio.gather(*(cache.get("blobs/a", _fetcher(calls)) for _ in range(5)))
+    assert len(set(paths)) == 1 and len(calls) == 1
+
+
+@pytest.mark.anyio
+async def test_lru_eviction_by_size_retires_copy(tmp_path):
+    cache = DiskCache(str(tmp_path), 250)
+    calls = []
+    first = await cache.get("a", _fetcher(calls))
+    await cache.get("b", _fetcher(calls))
+    # обращение к a делает самым давним b
+    await cache.get("a", _fetcher(calls))
+    await cache.get("c", _fetcher(calls))
+
+    assert cache.size == 200 and cache.stats()["evictions"] == 1
+    retired = os.path.join(tmp_path, "b")
+    # вытесненная копия ещё на диске (её мог открыть FileResponse), но помечена atime = 0
+    assert os.path.exists(retired) and os.stat(retired).st_atime == 0
+    assert cache.stats()["retired"] == 1
+    assert os.path.exists(first)
+
+
+@pytest.mark.anyio
+async def test_retired_copy_is_deleted_after_grace(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "EVICTION_GRACE", 0)
+    cache = DiskCache(str(tmp_path), 250)
+    for key in "abc":
+        await cache.get(key, _fetcher([]))
+    assert not os.path.exists(os.path.join(tmp_path, "a"))
+    assert sorted(os.listdir(tmp_path)) == ["b", "c"]
+    assert cache.stats()["retired"] == 0
+
+
+@pytest.mark.anyio
+async def test_retired_copy_is_fetched_again(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    calls = []
+    path = await cache.get("a", _fetcher(calls))
+    # другой воркер вытеснил копию
+    disk_cache._retire(path)
+    assert await cache.get("a", _fetcher(calls)) == path
+    assert len(calls) == 2
+    assert os.stat(path).st_atime != 0
+
+
+@pytest.mark.anyio
+async def test_rescan_shares_budget_and_skips_retired(tmp_path):
+    calls = []
+    first = DiskCache(str(tmp_path), 1000)
+    await first.get("a", _fetcher(calls))
+    await first.get("b", _fetcher(calls))
+    disk_cache._retire(os.path.join(tmp_path, "b"))
+    stale = os.path.join(tmp_path, ".fetch-stale")
+    with open(stale, "wb") as f:
+        f.write(b"partial")
+    old = time.time() - disk_cache.STALE_FETCH_AGE - 1
+    os.utime(stale, (old, old))
+
+    second = DiskCache(str(tmp_path), 1000)
+    await second._sync()
+    # копия a учтена в размере второго воркера, вытесненная b и брошенный .fetch- — нет
+    assert second.stats()["items"] == 1 and second.size == 100
+    assert not os.path.exists(stale)
+
+
+@pytest.mark.anyio
+async def test_invalidate_removes_copy(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    path = await cache.get("a", _fetcher([]))
+    await cache.invalidate("a")
+    assert not os.path.exists(path) and cache.size == 0
@@ -0,0 +1,126 @@
+import io
+import os
+import zipfile
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+
+from src.service.file import DocumentFileResponseService
+from src.settings import settings
+
+Row = namedtuple("Row", "id name hash path blob_id create_date size crc32")
+
+
+class FakeFiles:
+    def __init__(self, rows: list[Row]):
+        self.rows = rows
+
+    async def find_export_page(self, user_id, type, after_id, limit):
+        return [row for row in self.rows if row.id > after_id][:limit]
+
+
+class FakeUnitOfWork:
+    def __init__(self, rows: list[Row]):
+        self.repositories = SimpleNamespace(file=FakeFiles(rows))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+def _row(tmp_path, id: int, name: str, data: bytes, crc32: bool = True) -> Row:
+    # старый файл без blob: в path записан абсолютный путь с ключом файла в конце
+    hashed = f"{id:032x}.txt"
+    path = tmp_path / hashed
+    path.write_bytes(data)
+    return Row(id, name, hashed, str(path), None, datetime(2024, 5, 1, 10, 30, id * 2),
+               len(data), zlib.crc32(data) if crc32 else None)
+
+
+def _service(rows: list[Row]) -> DocumentFileResponseService:
+    service = DocumentFileResponseService(FakeUnitOfWork(rows))
+    service.user_id = 1
+    return service
+
+
+async def _read(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.fixture
+def contents():
+    return {"report.txt": os.urandom(70_000), "notes.txt": b"hello", "empty.txt": b""}
+
+
+@pytest.fixture
+def rows(tmp_path, contents):
+    rows = [_row(tmp_path, id, name, data) for id, (name, data) in enumerate(contents.items(), 1)]
+    # одинаковое имя получает номер
+    rows.append(_row(tmp_path, 4, "notes.txt", b"second"))
+    return rows
+
+
+@pytest.mark.anyio
+async def test_archive_unzips(rows, contents):
+    response = await _service(rows).export_my_files()
+    assert response.status_code == 200
+    body = await _read(response)
+    assert len(body) == int(response.headers["content-length"])
+
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["report.txt", "notes.txt", "empty.txt", "notes (1).txt"]
+    for name, data in contents.items():
+        assert archive.read(name) == data
+        assert archive.getinfo(name).compress_type == zipfile.ZIP_STORED
+    assert archive.read("notes (1).txt") == b"second"
+    assert archive.getinfo("report.txt").date_time == (2024, 5, 1, 10, 30, 2)
+
+
+@pytest.mark.anyio
+async def test_interrupted_download_resumes_with_range(rows):
+    full = await _read(await _service(rows).export_my_files())
+    first = await _service(rows).export_my_files()
+    etag = first.headers["etag"]
+    # соединение оборвалось посреди содержимого первого файла
+    received = full[:40_000]
+
+    response = await _service(rows).export_my_files(Headers({"range": f"bytes={len(received)}-", "if-range": etag}))
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {len(received)}-{len(full) - 1}/{len(full)}"
+    rest = await _read(response)
+    assert received + rest == full
+    assert zipfile.ZipFile(io.BytesIO(received + rest)).testzip() is None
+
+
+@pytest.mark.anyio
+async def test_changed_archive_is_sent_whole(tmp_path, rows):
+    etag = (await _service(rows).export_my_files()).headers["etag"]
+    rows.append(_row(tmp_path, 5, "new.txt", b"new"))
+    response = await _service(rows).export_my_files(Headers({"range": "bytes=100-", "if-range": etag}))
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_not_modified(rows):
+    etag = (await _service(rows).export_my_files()).headers["etag"]
+    response = await _service(rows).export_my_files(Headers({"if-none-match": etag}))
+    assert response.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_missing_crc32_refuses_export(tmp_path, rows):
+    rows.append(_row(tmp_path, 5, "pending.txt", b"not yet", crc32=False))
+    with pytest.raises(HTTPException) as error:
+        await _service(rows).export_my_files()
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": str(settings.reconcile_interval)}
+    assert error.value.detail.endswith("— 1")
@@ -0,0 +1,153 @@
+import os
+from email.utils import formatdate
+
+import pytest
+from starlette.datastructures import Headers
+
+from src.service.file import APKFileResponseService, DocumentFileResponseService
+from src.utils import file_responses
+from src.utils.file_responses import etag, file_response, not_modified
+from src.utils.metadata_cache import FileMeta
+from src.utils.record_cache import file_record_cache
+
+DATA = bytes(range(256)) * 4
+MTIME = 1_700_000_000
+
+
+@pytest.fixture
+def meta(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(DATA)
+    os.utime(path, (MTIME, MTIME))
+    return FileMeta(path=str(path), type="documents", is_active=True, size=len(DATA), mtime=MTIME,
+                    media_type="application/octet-stream", digest="ab" * 32, immutable=True)
+
+
+async def _read(response) -> bytes:
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cached", [False, True])
+async def test_full_response(meta, cached):
+    response = file_response(Headers(), meta, DATA if cached else None)
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(DATA))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == file_responses.IMMUTABLE_CACHE_CONTROL
+    assert await _read(response) == DATA
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cached", [False, True])
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+async def test_single_range(meta, cached, header, start, end):
+    response = file_response(Headers({"range": header}), meta, DATA if cached else None)
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(DATA)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+    assert await _read(response) == DATA[start:end + 1]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cached", [False, True])
+async def test_multiple_ranges(meta, cached):
+    response = file_response(Headers({"range": "bytes=0-9, 100-119"}), meta, DATA if cached else None)
+    assert response.status_code == 206
+    media_type, _, boundary = response.headers["content-type"].partition("; boundary=")
+    assert media_type == "multipart/byteranges"
+    body = await _read(response)
+    assert response.headers["content-length"] == str(len(body))
+
+    parts = body.split(f"--{boundary}".encode())
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    ranges = []
+    for part in parts[1:-1]:
+        head, _, content = part.partition(b"\r\n\r\n")
+        assert b"content-type: application/octet-stream" in head
+        ranges.append((head.split(b"content-range: ")[1].decode(), content[:-2]))
+    assert ranges == [(f"bytes 0-9/{len(DATA)}", DATA[0:10]), (f"bytes 100-119/{len(DATA)}", DATA[100:120])]
+
+
+def test_unsatisfiable_range(meta):
+    response = file_response(Headers({"range": f"bytes={len(DATA)}-"}), meta)
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+@pytest.mark.parametrize("header", ["items=0-10", "bytes=10-5", "bytes=abc"])
+def test_invalid_range_is_ignored(meta, header):
+    assert file_response(Headers({"range": header}), meta).status_code == 200
+
+
+def test_too_many_ranges_get_whole_file(meta):
+    header = "bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(file_responses.MAX_RANGES + 1))
+    assert file_response(Headers({"range": header}), meta).status_code == 200
+
+
+@pytest.mark.parametrize("if_range, status_code", [
+    (f'"{"ab" * 32}"', 206),
+    ('"other"', 200),
+    (formatdate(MTIME, usegmt=True), 206),
+    (formatdate(MTIME - 60, usegmt=True), 200),
+])
+def test_if_range(meta, if_range, status_code):
+    response = file_response(Headers({"range": "bytes=0-9", "if-range": if_range}), meta)
+    assert response.status_code == status_code
+
+
+def test_if_range_with_weak_etag_sends_whole_file(meta):
+    weak = FileMeta(**{**meta.__dict__, "digest": None})
+    assert etag(weak).startswith("W/")
+    response = file_response(Headers({"range": "bytes=0-9", "if-range": etag(weak)}), weak)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("headers, status_code", [
+    ({"if-none-match": f'"{"ab" * 32}"'}, 304),
+    ({"if-none-match": f'"other", W/"{"ab" * 32}"'}, 304),
+    ({"if-none-match": "*"}, 304),
+    ({"if-none-match": '"other"'}, None),
+    ({"if-modified-since": formatdate(MTIME, usegmt=True)}, 304),
+    ({"if-modified-since": formatdate(MTIME - 60, usegmt=True)}, None),
+    ({"if-modified-since": "not a date"}, None),
+    # If-None-Match имеет приоритет над If-Modified-Since
+    ({"if-none-match": '"other"', "if-modified-since": formatdate(MTIME, usegmt=True)}, None),
+])
+def test_not_modified(meta, headers, status_code):
+    response = not_modified(Headers(headers), meta)
+    assert (response and response.status_code) == status_code
+    if response is not None:
+        assert response.headers["etag"] == etag(meta)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("service, cache_control", [
+    (DocumentFileResponseService, file_responses.IMMUTABLE_CACHE_CONTROL),
+    (APKFileResponseService, file_responses.REVALIDATE_CACHE_CONTROL),
+])
+async def test_cache_control_by_type(tmp_path, monkeypatch, service, cache_control):
+    path = tmp_path / "app.apk"
+    path.write_bytes(DATA)
+
+    async def cached_record(type_name, hashed):
+        return {"blob_id": None, "path": "app.apk", "digest": None, "encodings": None}
+
+    monkeypatch.setattr(file_record_cache, "get", cached_record)
+    service = service(None)
+
+    async def resolve(record):
+        return str(path)
+
+    monkeypatch.setattr(service, "_resolve_path", resolve)
+    service.hashed = "app.apk"
+    meta = await service._load_metadata()
+    assert meta.is_active
+    assert file_responses.cache_control(meta) == cache_control
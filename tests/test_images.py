@@ -0,0 +1,101 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+from starlette.datastructures import UploadFile
+
+from src.service.file import PhotoFileUploadService
+from src.utils import images
+
+# начало MPEG program stream: Pillow такой файл не распознаёт
+MPEG_BYTES = b"\x00\x00\x01\xba" + os.urandom(4096)
+
+
+def _upload(name: str, data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data), filename=name)
+
+
+def _write(tmp_path, name: str, data: bytes) -> str:
+    path = os.path.join(tmp_path, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _jpeg(**options) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(out, format="JPEG", quality=95, **options)
+    return out.getvalue()
+
+
+@pytest.mark.anyio
+async def test_mpeg_photo_is_stored_unchanged():
+    service = PhotoFileUploadService(None, _upload("clip.mpeg", MPEG_BYTES), None)
+    assert not service._transforms()
+    await service._prepare()
+    assert service.digest == hashlib.sha256(MPEG_BYTES).hexdigest()
+    assert service.size == len(MPEG_BYTES)
+
+
+def test_unidentified_image_is_left_as_is(tmp_path):
+    path = _write(tmp_path, "broken.jpg", MPEG_BYTES)
+    images._optimize(path, 85)
+    with open(path, "rb") as f:
+        assert f.read() == MPEG_BYTES
+
+
+@pytest.mark.anyio
+async def test_optimize_in_pool_accepts_unidentified_file(tmp_path):
+    path = _write(tmp_path, "broken.png", MPEG_BYTES)
+    await images.optimize(path)
+    with open(path, "rb") as f:
+        assert f.read() == MPEG_BYTES
+
+
+def test_optimize_strips_exif_and_keeps_icc_profile(tmp_path):
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    icc = b"\x00" * 128
+    path = _write(tmp_path, "photo.jpg", _jpeg(exif=exif.tobytes(), icc_profile=icc))
+    images._optimize(path, 85)
+    with Image.open(path) as image:
+        assert not image.getexif()
+        assert image.info.get("icc_profile") == icc
+
+
+def test_optimize_applies_orientation(tmp_path):
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    path = _write(tmp_path, "rotated.jpg", _jpeg(exif=exif.tobytes()))
+    images._optimize(path, 85)
+    with Image.open(path) as image:
+        assert image.size == (48, 64)
+        assert image.getexif().get(0x0112, 1) == 1
+
+
+def test_palette_png_keeps_palette(tmp_path):
+    out = io.BytesIO()
+    image = Image.new("P", (32, 32))
+    image.putpalette([value for index in range(256) for value in (index, 0, 255 - index)])
+    image.save(out, format="PNG", pnginfo=None)
+    path = _write(tmp_path, "palette.png", out.getvalue())
+    images._optimize(path, 85)
+    with Image.open(path) as result:
+        assert result.mode == "P"
+    assert os.path.getsize(path) <= len(out.getvalue())
+
+
+def test_optimize_never_grows_file(tmp_path):
+    from PIL import PngImagePlugin
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Comment", "secret location")
+    out = io.BytesIO()
+    Image.new("RGB", (16, 16), (1, 2, 3)).save(out, format="PNG", optimize=True, pnginfo=info)
+    path = _write(tmp_path, "tiny.png", out.getvalue())
+    images._optimize(path, 85)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(data) <= len(out.getvalue())
+    assert b"secret location" not in data
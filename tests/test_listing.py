@@ -0,0 +1,105 @@
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from src.schemas.file import AllFilesOutput, DataFile
+from src.service.file import DocumentFileResponseService
+from src.settings import settings
+from src.utils.pagination import decode_cursor
+from src.utils.serialization import files_ndjson, files_page_json
+
+Row = namedtuple("Row", "id name hash create_date digest")
+PREFIX = "http://files.test/files/documents/"
+
+
+def _rows(count: int) -> list[Row]:
+    start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    # как в find_page: по убыванию (create_date, id); у двух файлов одинаковое время загрузки
+    rows = [Row(id, f"файл {id}.pdf", f"{id:032x}.pdf", start + timedelta(seconds=id // 2), None)
+            for id in range(1, count + 1)]
+    return sorted(rows, key=lambda row: (row.create_date, row.id), reverse=True)
+
+
+class FakeFiles:
+    def __init__(self, rows: list[Row]):
+        self.rows = rows
+        self.pages = 0
+
+    async def find_page(self, user_id, type, after, limit):
+        self.pages += 1
+        rows = [row for row in self.rows if after is None or (row.create_date, row.id) < after]
+        return rows[:limit]
+
+
+class FakeUnitOfWork:
+    def __init__(self, rows: list[Row]):
+        self.repositories = SimpleNamespace(file=FakeFiles(rows))
+        self.sessions = 0
+        self.active = False
+
+    async def __aenter__(self):
+        self.sessions += 1
+        self.active = True
+        return self
+
+    async def __aexit__(self, *args):
+        self.active = False
+
+
+def _service(rows: list[Row]) -> DocumentFileResponseService:
+    service = DocumentFileResponseService(FakeUnitOfWork(rows))
+    service.user_id = 1
+    return service
+
+
+def test_page_json_matches_pydantic_output():
+    rows = _rows(5)
+    old = AllFilesOutput(
+        items=[DataFile(id=row.id, name=row.name, hash=row.hash, create_date=row.create_date,
+                        url=PREFIX + row.hash) for row in rows],
+        next_cursor="abc",
+    ).model_dump(mode="json")
+    assert orjson.loads(files_page_json(rows, "documents", PREFIX, "abc")) == old
+    # порядок ключей тот же, что у модели
+    assert list(json.loads(files_page_json(rows, "documents", PREFIX, None))) == ["status", "items", "next_cursor"]
+
+
+@pytest.mark.anyio
+async def test_get_my_files_pages_by_cursor():
+    rows = _rows(5)
+    service = _service(rows)
+    seen, cursor = [], None
+    while True:
+        body = orjson.loads((await service.get_my_files(cursor, 2)).body)
+        seen += [item["id"] for item in body["items"]]
+        if body["next_cursor"] is None:
+            break
+        cursor = body["next_cursor"]
+        last = next(row for row in rows if row.id == seen[-1])
+        assert decode_cursor(cursor) == (last.create_date, last.id)
+    assert seen == [row.id for row in rows]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("count", [0, 1, 4, 5])
+async def test_ndjson_across_page_boundaries(monkeypatch, count):
+    monkeypatch.setattr(settings, "listing_max_page_size", 2)
+    rows = _rows(count)
+    service = _service(rows)
+    chunks = []
+    async for chunk in service._iter_all_files():
+        # страница отдаётся клиенту уже после закрытия сессии
+        assert not service.uow.active
+        chunks.append(chunk)
+
+    body = b"".join(chunks)
+    assert body == files_ndjson(rows, "documents", PREFIX)
+    lines = body.splitlines()
+    assert len(lines) == count and all(line for line in lines)
+    assert [orjson.loads(line)["id"] for line in lines] == [row.id for row in rows]
+    # страницы по 2 строки и пустая последняя
+    assert service.uow.sessions == count // 2 + 1 + (count % 2)
@@ -0,0 +1,159 @@
+import asyncio
+import socket
+
+import pytest
+
+from src.adapters.cache.local_memcached import LocalMemcachedServer
+from src.adapters.cache.memcached import AsyncMemcachedClient, CircuitBreaker, HashRing
+
+
+def _dead_address() -> str:
+    # порт, который только что освободился: соединение к нему отклоняется
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "127.0.0.1:%d" % sock.getsockname()[1]
+
+
+@pytest.fixture
+async def servers():
+    started = [LocalMemcachedServer(), LocalMemcachedServer()]
+    for server in started:
+        await server.start()
+    yield started
+    for server in started:
+        await server.close()
+
+
+def test_hash_ring_moves_only_keys_of_removed_node():
+    nodes = ["a:1", "b:1", "c:1"]
+    before = HashRing(nodes)
+    after = HashRing(["a:1", "b:1"])
+    keys = [f"file:photos:{index}" for index in range(3000)]
+    owners = {key: before.node(key) for key in keys}
+    # ключи распределены по всем серверам примерно поровну
+    for node in nodes:
+        assert 700 < sum(owner == node for owner in owners.values()) < 1300
+    for key, owner in owners.items():
+        if owner != "c:1":
+            assert after.node(key) == owner
+
+
+@pytest.mark.anyio
+async def test_set_get_delete_and_expiry(servers):
+    client = AsyncMemcachedClient([server.address for server in servers])
+    try:
+        assert await client.set("key", b"value")
+        assert await client.get("key") == b"value"
+        assert await client.set("short", b"value", expire=1)
+        ttl, value = await client.get_with_ttl("short")
+        assert value == b"value" and 0 <= ttl <= 1
+        assert await client.delete("key")
+        assert await client.get("key") is None
+        await asyncio.sleep(1.1)
+        assert await client.get("short") is None
+    finally:
+        await client.close()
+
+
+@pytest.mark.anyio
+async def test_long_and_unsafe_keys_are_hashed(servers):
+    client = AsyncMemcachedClient([server.address for server in servers])
+    try:
+        for key in ("x" * 400, "key with spaces"):
+            assert await client.set(key, b"value")
+            assert await client.get(key) == b"value"
+    finally:
+        await client.close()
+
+
+@pytest.mark.anyio
+async def test_get_many_sends_one_command_per_server(servers):
+    client = AsyncMemcachedClient([server.address for server in servers])
+    try:
+        keys = [f"key-{index}" for index in range(50)]
+        for key in keys:
+            await client.set(key, key.encode())
+        for server in servers:
+            server.commands.clear()
+        values = await client.get_many(keys + ["missing"])
+        assert values == {key: key.encode() for key in keys}
+        for server in servers:
+            assert len(server.commands) == 1 and server.commands[0].startswith(b"get ")
+    finally:
+        await client.close()
+
+
+@pytest.mark.anyio
+async def test_unavailable_server_is_a_cache_miss(servers):
+    dead = _dead_address()
+    client = AsyncMemcachedClient([servers[0].address, dead], timeout=0.2)
+    try:
+        keys = [f"key-{index}" for index in range(20)]
+        for key in keys:
+            await client.set(key, b"1")
+        values = await client.get_many(keys)
+        # ключи живого сервера читаются, ключи недоступного — промах, а не ошибка
+        alive = [key for key in keys if client._ring.node(key) == servers[0].address]
+        assert alive and set(values) == set(alive)
+    finally:
+        await client.close()
+
+
+@pytest.mark.anyio
+async def test_slow_server_times_out():
+    slow = LocalMemcachedServer(delay=1)
+    await slow.start()
+    client = AsyncMemcachedClient([slow.address], timeout=0.1)
+    try:
+        started = asyncio.get_running_loop().time()
+        assert await client.get("key") is None
+        assert await client.set("key", b"value") is False
+        assert asyncio.get_running_loop().time() - started < 0.8
+    finally:
+        await client.close()
+        await slow.close()
+
+
+@pytest.mark.anyio
+async def test_breaker_opens_and_probes_after_pause():
+    server = LocalMemcachedServer()
+    address = _dead_address()
+    server.port = int(address.rsplit(":", 1)[1])
+    client = AsyncMemcachedClient([address], timeout=0.2, failure_threshold=2, retry_after=0.3)
+    pool = client._pools[address]
+    try:
+        assert await client.get("key") is None
+        assert await client.get("key") is None
+        assert pool.breaker.opened_at is not None
+        # пока breaker открыт, запросы не доходят до сервера
+        await server.start()
+        assert await client.set("key", b"value") is False
+        assert server.commands == []
+
+        await asyncio.sleep(0.35)
+        assert await client.set("key", b"value")
+        assert pool.breaker.opened_at is None and pool.breaker.failures == 0
+        assert await client.get("key") == b"value"
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_breaker_lets_one_probe_through(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.adapters.cache.memcached.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, retry_after=5)
+    breaker.failure()
+    assert not breaker.allow()
+    now[0] += 5
+    assert breaker.allow()
+    # вторая попытка ждёт результата пробы
+    assert not breaker.allow()
+    breaker.failure()
+    assert not breaker.allow()
+    now[0] += 5
+    assert breaker.allow()
+    breaker.abort()
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.allow() and breaker.allow()
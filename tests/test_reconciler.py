@@ -0,0 +1,128 @@
+import os
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from src.adapters.storage.backends import LocalStorage
+from src.service import reconciler
+from src.service.reconciler import StorageReconciler
+
+
+class Recorder:
+    def __init__(self, uow, **methods):
+        self.uow = uow
+        self.calls = []
+        for name, result in methods.items():
+            setattr(self, name, self._method(name, result))
+
+    def _method(self, name, result):
+        async def method(*args, **kwargs):
+            # к репозиторию обращаются только внутри сессии
+            assert self.uow.active
+            self.calls.append((name, args, kwargs))
+            return result(*args, **kwargs) if callable(result) else result
+        return method
+
+
+class FakeUnitOfWork:
+    def __init__(self):
+        self.active = False
+        self.commits = 0
+        self.repositories = SimpleNamespace()
+
+    async def __aenter__(self):
+        self.active = True
+        return self
+
+    async def __aexit__(self, *args):
+        self.active = False
+
+    async def commit(self):
+        self.commits += 1
+
+
+class CheckedStorage(LocalStorage):
+    """
+    Локальное хранилище, которое проверяет, что к нему обращаются без открытой транзакции
+    """
+
+    def __init__(self, root, uow):
+        super().__init__(root)
+        self.uow = uow
+
+    async def exists(self, key):
+        assert not self.uow.active
+        return await super().exists(key)
+
+    async def digest(self, key, chunk_size):
+        assert not self.uow.active
+        return await super().digest(key, chunk_size)
+
+    async def local_path(self, key):
+        raise AssertionError("сверка не должна заполнять кэш локальных копий")
+
+
+def _blob(id, ref_count=1):
+    return SimpleNamespace(id=id, path=f"blobs/{id:02x}", ref_count=ref_count)
+
+
+def _paged(items):
+    def page(after_id, limit):
+        return [item for item in items if item.id > after_id][:limit]
+    return page
+
+
+@pytest.fixture
+def uow(monkeypatch):
+    uow = FakeUnitOfWork()
+    monkeypatch.setattr(reconciler, "UnitOfWork", lambda: uow)
+    return uow
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch, uow):
+    storage = CheckedStorage(str(tmp_path), uow)
+    monkeypatch.setattr(reconciler, "get_storage", lambda: storage)
+    return storage
+
+
+def _write(storage, blob, data: bytes):
+    path = storage.path(blob.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.mark.anyio
+async def test_backfill_crc32_reads_outside_transaction(uow, storage):
+    blobs = [_blob(id) for id in range(1, 6)]
+    for blob in blobs[:4]:
+        _write(storage, blob, f"content {blob.id}".encode())
+    uow.repositories.blob = Recorder(uow, find_without_crc32=_paged(blobs), edit_many=None)
+
+    service = StorageReconciler()
+    service.batch_size, service.pause = 2, 0
+    await service.backfill_crc32()
+
+    written = [value for name, args, _ in uow.repositories.blob.calls if name == "edit_many" for value in args[0]]
+    # содержимого blob 5 нет — он пропускается
+    assert written == [{"id": id, "crc32": zlib.crc32(f"content {id}".encode())} for id in range(1, 5)]
+    assert uow.commits == 2
+
+
+@pytest.mark.anyio
+async def test_deactivate_missing_blobs_checks_outside_transaction(uow, storage):
+    blobs = [_blob(1), _blob(2), _blob(3, ref_count=0)]
+    _write(storage, blobs[0], b"present")
+    uow.repositories.blob = Recorder(uow, find_after=_paged(blobs), edit_many=None)
+    uow.repositories.file = Recorder(uow, deactivate_many=[])
+
+    service = StorageReconciler()
+    service.batch_size, service.pause = 10, 0
+    await service.deactivate_missing_blobs()
+
+    # blob без ссылок не проверяется, у пропавшего отключаются файлы и обнуляется счётчик
+    assert uow.repositories.file.calls == [("deactivate_many", (), {"blob_id": 2})]
+    assert ("edit_many", ([{"id": 2, "ref_count": 0}],), {}) in uow.repositories.blob.calls
+    assert uow.commits == 1
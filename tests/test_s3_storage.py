@@ -0,0 +1,119 @@
+import hashlib
+import os
+import zlib
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from src.adapters.storage.s3 import S3Storage
+from src.settings import settings
+
+BUCKET = "files-test"
+# минимальный размер части multipart в S3
+CHUNK = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(settings, "s3_multipart_chunk_size", CHUNK)
+    monkeypatch.setattr(settings, "storage_cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "storage_cache_bytes", 3 * CHUNK)
+    with moto.mock_aws():
+        storage = S3Storage(BUCKET, {"region_name": "us-east-1"})
+        storage.client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+def _source(tmp_path, name: str, size: int) -> str:
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+@pytest.mark.anyio
+async def test_large_file_uploaded_in_parts(storage, tmp_path):
+    source = _source(tmp_path, "large", 2 * CHUNK + 1)
+    with open(source, "rb") as f:
+        data = f.read()
+    await storage.put("blobs/large", source)
+
+    # ETag multipart-объекта — "<md5 частей>-<число частей>"
+    head = storage.client.head_object(Bucket=BUCKET, Key="blobs/large")
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["ContentLength"] == len(data)
+    # staging удаляется после загрузки
+    assert not os.path.exists(source)
+
+    path = await storage.local_path("blobs/large")
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+
+@pytest.mark.anyio
+async def test_small_file_uploaded_whole_and_kept(storage, tmp_path):
+    source = _source(tmp_path, "small", 1000)
+    await storage.put("blobs/small", source, keep=True)
+    head = storage.client.head_object(Bucket=BUCKET, Key="blobs/small")
+    assert "-" not in head["ETag"]
+    assert os.path.exists(source)
+
+
+@pytest.mark.anyio
+async def test_read_through_cache(storage, tmp_path):
+    await storage.put("blobs/a", _source(tmp_path, "a", 1000))
+    path = await storage.local_path("blobs/a")
+    assert path.startswith(settings.storage_cache_dir)
+
+    # Last-Modified копии совпадает с объектом
+    head = storage.client.head_object(Bucket=BUCKET, Key="blobs/a")
+    assert os.stat(path).st_mtime == head["LastModified"].timestamp()
+
+    assert await storage.local_path("blobs/a") == path
+    cache = storage.stats()["cache"]
+    assert cache["misses"] == 1 and cache["hits"] == 1 and cache["bytes"] == 1000
+
+
+@pytest.mark.anyio
+async def test_digest_streams_without_cache(storage, tmp_path):
+    source = _source(tmp_path, "a", 100_000)
+    with open(source, "rb") as f:
+        data = f.read()
+    await storage.put("blobs/a", source)
+
+    assert await storage.digest("blobs/a", 4096) == (hashlib.sha256(data).hexdigest(), len(data), zlib.crc32(data))
+    assert await storage.digest("blobs/none", 4096) is None
+    assert storage.stats()["cache"]["items"] == 0
+
+
+@pytest.mark.anyio
+async def test_missing_object(storage):
+    assert await storage.local_path("blobs/none") is None
+    assert not await storage.exists("blobs/none")
+    assert storage.stats()["cache"]["items"] == 0
+
+
+@pytest.mark.anyio
+async def test_delete_invalidates_cached_copy(storage, tmp_path):
+    await storage.put("blobs/a", _source(tmp_path, "a", 1000))
+    await storage.put("blobs/b", _source(tmp_path, "b", 1000))
+    path = await storage.local_path("blobs/a")
+
+    await storage.delete_many(["blobs/a", "blobs/b"])
+    assert not os.path.exists(path)
+    assert not await storage.exists("blobs/a")
+    assert await storage.local_path("blobs/a") is None
+
+
+@pytest.mark.anyio
+async def test_iter_batches(storage, tmp_path):
+    for name in "abcde":
+        await storage.put(f"blobs/{name}", _source(tmp_path, name, 10))
+    await storage.put("staging/x", _source(tmp_path, "x", 10))
+
+    batches = [batch async for batch in storage.iter_batches("blobs/", 2)]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert sorted(key for batch in batches for key, _ in batch) == [f"blobs/{name}" for name in "abcde"]
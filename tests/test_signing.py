@@ -0,0 +1,57 @@
+import time
+from urllib.parse import urlsplit
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import QueryParams
+
+from src.settings import settings
+from src.utils.signing import file_url, verify_signature
+
+DIGEST = "ab" * 32
+
+
+@pytest.fixture(autouse=True)
+def signed(monkeypatch):
+    monkeypatch.setattr(settings, "signed_urls", True)
+
+
+def _query(url: str) -> QueryParams:
+    return QueryParams(urlsplit(url).query)
+
+
+def test_signed_url_round_trip():
+    query = _query(file_url("photos", "key.jpg", DIGEST))
+    assert verify_signature("photos", "key.jpg", query) == DIGEST
+    # ссылка живёт SIGNED_URL_TTL, по умолчанию час
+    assert int(query["exp"]) - time.time() == pytest.approx(60 * 60, abs=5)
+
+
+def test_file_without_blob():
+    assert verify_signature("photos", "key.jpg", _query(file_url("photos", "key.jpg"))) is None
+
+
+@pytest.mark.parametrize("type_name, hashed, change", [
+    ("photos", "other.jpg", {}),
+    ("videos", "key.jpg", {}),
+    ("photos", "key.jpg", {"d": "cd" * 32}),
+    ("photos", "key.jpg", {"sig": "forged"}),
+])
+def test_tampered_signature(type_name, hashed, change):
+    query = dict(_query(file_url("photos", "key.jpg", DIGEST)))
+    query.update(change)
+    with pytest.raises(HTTPException) as error:
+        verify_signature(type_name, hashed, QueryParams(query))
+    assert error.value.status_code == 403
+
+
+def test_expired_signature(monkeypatch):
+    monkeypatch.setattr(settings, "signed_url_ttl", -1)
+    with pytest.raises(HTTPException) as error:
+        verify_signature("photos", "key.jpg", _query(file_url("photos", "key.jpg", DIGEST)))
+    assert error.value.detail == "Срок действия ссылки истёк"
+
+
+def test_unsigned_url_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "signed_urls", False)
+    assert file_url("photos", "key.jpg", DIGEST) == settings.file_server_url + "files/photos/key.jpg"
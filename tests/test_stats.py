@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from src.router.stats import stats_router
+from src.settings import settings
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(stats_router)
+    return TestClient(app)
+
+
+def _token(roles: list[str]) -> dict:
+    expires = int((datetime.now() + timedelta(hours=1)).timestamp())
+    token = jwt.encode({"id": 1, "roles": roles, "exp": expires}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_stats_requires_token(client):
+    assert client.get("/stats").status_code == 403
+
+
+def test_stats_requires_role(client):
+    assert client.get("/stats", headers=_token(["user"])).status_code == 401
+
+
+def test_stats_for_admin(client):
+    response = client.get("/stats", headers=_token([settings.stats_role]))
+    assert response.status_code == 200
+    assert set(response.json()) == {"download_cache", "jwt_cache", "connection_hold_time", "storage", "image_variants"}
@@ -0,0 +1,97 @@
+import hashlib
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from src.adapters.storage.backends import get_storage
+from src.adapters.storage.blobs import blob_store
+from src.service import file as file_service
+from src.service.file import DocumentFileUploadService
+
+TEXT = b"plain text that compresses well\n" * 2000
+
+
+class FakeUnitOfWork:
+    """
+    Транзакция начинается с первой записи (acquire) и заканчивается commit
+    """
+
+    def __init__(self, ref_count: int, on_acquire):
+        self.in_transaction = False
+        self.committed = False
+        self.records = []
+        self.edits = []
+
+        async def acquire(digest, key, size, crc32):
+            self.in_transaction = True
+            on_acquire()
+            return SimpleNamespace(id=1, path=key, ref_count=ref_count)
+
+        async def edit_one(id, data):
+            self.edits.append(data)
+
+        async def add_one(record):
+            self.records.append(record)
+
+        async def add_usage(*args):
+            return True
+
+        self.repositories = SimpleNamespace(
+            blob=SimpleNamespace(acquire=acquire, edit_one=edit_one),
+            file=SimpleNamespace(add_one=add_one),
+            usage=SimpleNamespace(add=add_usage),
+        )
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+
+def _service(ref_count: int, on_acquire=lambda: None) -> DocumentFileUploadService:
+    upload = UploadFile(io.BytesIO(TEXT), size=len(TEXT), filename="notes.txt")
+    service = DocumentFileUploadService(FakeUnitOfWork(ref_count, on_acquire), upload, None)
+    service.user_id = 1
+    return service
+
+
+@pytest.fixture(autouse=True)
+def no_invalidation(monkeypatch):
+    async def invalidate(type_name, hashed):
+        pass
+
+    monkeypatch.setattr(file_service, "invalidate_file", invalidate)
+
+
+@pytest.mark.anyio
+async def test_new_content_is_staged_and_compressed_before_transaction():
+    state = {}
+    service = _service(1, lambda: state.update(saved=service.saved, staged=os.path.exists(service.staged.path),
+                                              encoded=dict(service.encoded)))
+    await service.upload()
+
+    # к моменту блокировки строки blob содержимое уже в staging вместе со сжатыми копиями
+    assert state["saved"] and state["staged"]
+    assert "gzip" in state["encoded"]
+    assert service.uow.committed
+    assert service.uow.edits == [{"encodings": service.encodings}]
+
+    key = blob_store.key(hashlib.sha256(TEXT).hexdigest())
+    with open(await get_storage().local_path(key), "rb") as f:
+        assert f.read() == TEXT
+    assert os.path.exists(get_storage().path(blob_store.encoded_key(key, "gzip")))
+    # временные файлы не остаются
+    assert all(not os.path.exists(path) for path in state["encoded"].values())
+
+
+@pytest.mark.anyio
+async def test_stored_content_is_not_written_again():
+    await _service(1).upload()
+    service = _service(2)
+    await service.upload()
+    assert not service.saved
+    assert service.uow.committed and service.uow.edits == []